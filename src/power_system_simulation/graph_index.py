@@ -0,0 +1,226 @@
+"""
+`graph_index.py` contains the index structures of `graph_processing.GraphProcessor`
+and the versioned binary file format they are saved in.
+
+The module contains:
+1. `Traversal`, the rooted tree found by a depth first search
+2. `GraphTopology`, the validated compressed sparse row (CSR) topology
+3. `GraphState`, the enabled edge mask and the indexes that depend on it
+4. `writable(array: np.ndarray) -> np.ndarray`
+5. `save_index(path: str, topology: GraphTopology, state: GraphState) -> None`
+6. `load_index(path: str) -> Tuple[GraphTopology, GraphState, np.ndarray]`
+7. `write_index_file(path: str, arrays: dict, attributes: dict) -> None`
+8. `read_index_file(path: str) -> Tuple[dict, dict]`
+
+The file starts with GRAPH_FILE_MAGIC, the format version and a JSON header describing the arrays.
+Every array is stored raw and aligned, so it can be opened zero-copy with np.memmap.
+"""
+
+import json
+from typing import NamedTuple, Tuple
+
+import numpy as np
+
+
+class InvalidGraphFileError(Exception):
+    """Raises InvalidGraphFileError if a saved graph index file is not valid or has an unsupported version
+
+    Args:
+        Exception: _description_
+    """
+
+
+# binary graph index file layout, see write_index_file
+GRAPH_FILE_MAGIC = b"PSSGRAPH"
+GRAPH_FILE_VERSION = 1
+GRAPH_FILE_ALIGNMENT = 64
+
+
+class Traversal(NamedTuple):
+    """Result of a depth first search over the graph, all arrays are indexed by dense vertex index.
+
+    Args:
+        order: vertex indices in visiting (pre-)order
+        entry: position of each vertex in order, -1 if not visited
+        parent: parent vertex index, -1 for the start vertex and not visited vertices
+        parent_edge: edge index to the parent vertex, -1 for the start vertex and not visited vertices
+        depth: number of edges to the start vertex, -1 if not visited
+        subtree_end: the subtree of a vertex is order[entry[vertex] : subtree_end[vertex]]
+    """
+
+    order: np.ndarray
+    entry: np.ndarray
+    parent: np.ndarray
+    parent_edge: np.ndarray
+    depth: np.ndarray
+    subtree_end: np.ndarray
+
+
+class GraphTopology(NamedTuple):
+    """Validated topology of the graph in compressed sparse row (CSR) form, built once and never changed.
+
+    Args:
+        vertex_ids: vertex IDs, the dense index of a vertex is its position here
+        vertex_sorter: argsort of vertex_ids, to map IDs to dense indices
+        edge_ids: edge IDs, the dense index of an edge is its position here
+        edge_sorter: argsort of edge_ids
+        edge_vertices: dense vertex indices of both ends of every edge
+        offsets: arcs of vertex i are stored in [offsets[i], offsets[i + 1])
+        neighbors: vertex index at the end of each arc
+        neighbor_edges: edge index of each arc
+        source: dense vertex index of the source
+    """
+
+    vertex_ids: np.ndarray
+    vertex_sorter: np.ndarray
+    edge_ids: np.ndarray
+    edge_sorter: np.ndarray
+    edge_vertices: np.ndarray
+    offsets: np.ndarray
+    neighbors: np.ndarray
+    neighbor_edges: np.ndarray
+    source: int
+
+
+class GraphState(NamedTuple):
+    """Switching state of the graph and the indexes that depend on it, replaced as a whole when it changes.
+
+    Args:
+        edge_enabled: boolean mask per edge index
+        tree: rooted tree of the enabled edges, None until it is built
+        ancestors: (tree, binary lifting table) of the lowest common ancestor queries, None until it is built
+    """
+
+    edge_enabled: np.ndarray
+    tree: Traversal = None
+    ancestors: tuple = None
+
+
+# other functions not dependent on specific class
+
+
+def writable(array: np.ndarray) -> np.ndarray:
+    """Returns the array itself if it can be updated in place, or a copy if it is read-only.
+
+    Args:
+        array: array that may be shared with a frozen snapshot or a memory-mapped file
+
+    Returns:
+        np.ndarray: writable array with the same values
+    """
+    return array if array.flags.writeable else array.copy()
+
+
+def save_index(path: str, topology: GraphTopology, state: GraphState) -> None:
+    """Saves a topology and its fully built state to a binary index file, see write_index_file.
+
+    Args:
+        path: file to write
+        topology: validated topology of the graph
+        state: state with the rooted tree and the ancestor table built
+    """
+    arrays = {name: getattr(topology, name) for name in GraphTopology._fields[:-1]}
+    arrays["edge_vertex_id_pairs"] = topology.vertex_ids[topology.edge_vertices]
+    arrays["edge_enabled"] = state.edge_enabled
+    arrays["ancestors"] = state.ancestors[1]
+    arrays.update({f"tree_{name}": getattr(state.tree, name) for name in Traversal._fields})
+
+    write_index_file(path, arrays, {"source": topology.source})
+
+
+def load_index(path: str) -> Tuple[GraphTopology, GraphState, np.ndarray]:
+    """Loads a topology and its state saved with save_index, all arrays are read-only memory maps.
+
+    Args:
+        path: file written by save_index
+
+    Returns:
+        topology: validated topology of the graph
+        state: state with the rooted tree and the ancestor table built
+        edge_vertex_id_pairs: vertex IDs of both ends of every edge
+
+    Raises:
+        InvalidGraphFileError: if the file is not a graph index file or has an unsupported version
+    """
+    arrays, attributes = read_index_file(path)
+
+    topology = GraphTopology(**{name: arrays[name] for name in GraphTopology._fields[:-1]}, source=attributes["source"])
+    tree = Traversal(**{name: arrays[f"tree_{name}"] for name in Traversal._fields})
+    state = GraphState(arrays["edge_enabled"], tree, (tree, arrays["ancestors"]))
+
+    return topology, state, arrays["edge_vertex_id_pairs"]
+
+
+def write_index_file(path: str, arrays: dict, attributes: dict) -> None:
+    """Writes NumPy arrays to a binary index file that can be opened with np.memmap.
+
+    Layout: GRAPH_FILE_MAGIC, format version and header length as little-endian uint32, JSON header,
+    followed by the raw C-ordered arrays, each starting at a multiple of GRAPH_FILE_ALIGNMENT bytes.
+
+    Args:
+        path: file to write
+        arrays: dict of name and array
+        attributes: dict of JSON serializable values stored in the header
+    """
+
+    def aligned(position: int) -> int:
+        return -(-position // GRAPH_FILE_ALIGNMENT) * GRAPH_FILE_ALIGNMENT
+
+    arrays = {name: np.ascontiguousarray(array) for name, array in arrays.items()}
+    header = {"attributes": attributes, "arrays": {}}
+
+    # the array offsets depend on the header length, so grow the reserved header space until it fits
+    reserved = GRAPH_FILE_ALIGNMENT
+    while True:
+        position = aligned(len(GRAPH_FILE_MAGIC) + 8 + reserved)
+        for name, array in arrays.items():
+            header["arrays"][name] = {"dtype": array.dtype.str, "shape": list(array.shape), "offset": position}
+            position = aligned(position + array.nbytes)
+        encoded_header = json.dumps(header).encode("utf-8")
+        if len(encoded_header) <= reserved:
+            break
+        reserved = aligned(len(encoded_header))
+
+    with open(path, "wb") as file:
+        file.write(GRAPH_FILE_MAGIC)
+        file.write(np.array([GRAPH_FILE_VERSION, reserved], dtype="<u4").tobytes())
+        file.write(encoded_header.ljust(reserved))
+        for name, array in arrays.items():
+            file.seek(header["arrays"][name]["offset"])
+            file.write(array.tobytes())
+        file.truncate(position)
+
+
+def read_index_file(path: str) -> Tuple[dict, dict]:
+    """Opens the arrays of a binary index file written by write_index_file as read-only memory maps.
+
+    Args:
+        path: file to read
+
+    Returns:
+        arrays: dict of name and read-only array
+        attributes: dict of values stored in the header
+
+    Raises:
+        InvalidGraphFileError: if the file is not an index file or has an unsupported version
+    """
+    with open(path, "rb") as file:
+        magic = file.read(len(GRAPH_FILE_MAGIC))
+        version, header_length = np.frombuffer(file.read(8).ljust(8, b"\0"), dtype="<u4")
+        if magic != GRAPH_FILE_MAGIC:
+            raise InvalidGraphFileError("File is not a graph index file")
+        if version != GRAPH_FILE_VERSION:
+            raise InvalidGraphFileError(f"Graph index file version {version} is not supported")
+        header = json.loads(file.read(int(header_length)))
+
+    arrays = {}
+    for name, layout in header["arrays"].items():
+        shape = tuple(layout["shape"])
+        if np.prod(shape) == 0:
+            array = np.empty(shape, dtype=layout["dtype"])
+            array.flags.writeable = False
+        else:
+            array = np.memmap(path, dtype=layout["dtype"], mode="r", offset=layout["offset"], shape=shape)
+        arrays[name] = array
+
+    return arrays, header["attributes"]
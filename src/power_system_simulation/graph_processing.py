@@ -1,5 +1,5 @@
 """
-`graph_processing.py` contains the class `GraphProcessor`. 
+`graph_processing.py` contains the class `GraphProcessor`.
 
 This class defines and validates a grid and runs processing functions. It is initialized with parameters:
 `def __init__(`
@@ -18,13 +18,26 @@ The object saves:
 4. `self.edge_enabled`
 5. `self.source_vertex_id`
 
-The class contains the functions: 
-1. `dfs(self, adjacency_list, visited, parent, parent_list, start_node) -> List[int]`
-2. `build_adjacency_list(self, edge_vertex_id_pairs, edge_enabled)`
-3. `find_downstream_vertices(self, edge_id: int) -> List[int]`
-4. `find_alternative_edges(self, disabled_edge_id: int) -> List[int]`
-5. `graph_plotter(self, plot_criteria=EnabledEdges) -> None`
-6. `sort_tuple_list(edge_vertex_id_pairs) -> List[Tuple[int, int]]`
+The class contains the functions:
+1. `dfs(self, start_node: int, enabled: np.ndarray) -> Traversal`
+2. `find_downstream_vertices(self, edge_id: int) -> List[int]`
+3. `find_alternative_edges(self, disabled_edge_id: int) -> List[int]`
+4. `find_all_alternative_edges(self) -> sp.sparse.csr_array`
+5. `enable_edge(self, edge_id: int, disabled_edge_id: int) -> None`
+6. `disable_edge(self, edge_id: int, enabled_edge_id: int) -> None`
+7. `graph_plotter(self, plot_criteria=EnabledEdges) -> None`
+8. `save(self, path: str) -> None`
+9. `freeze(self) -> FrozenGraphProcessor`
+
+Internally the network is stored as a compressed sparse row (CSR) topology, built once upon initialization:
+vertex and edge IDs are remapped to dense indices, the adjacency is kept in NumPy offset/neighbor arrays
+and a boolean mask tracks which edges are enabled.
+
+All queries are free of side effects: they only read the indexes and keep their working state in per-call buffers.
+Switching actions should not run concurrently with queries on the same object.
+`FrozenGraphProcessor` is an immutable variant that can be shared between threads or asyncio tasks.
+`FrozenGraphProcessor.load(path)` memory-maps an index saved with `save` without validating or traversing again.
+The index structures and the file format are defined in `graph_index.py`.
 """
 
 from enum import IntEnum
@@ -32,6 +45,13 @@ from typing import List, Tuple
 
 import matplotlib.pyplot as plt
 import networkx as nx
+import numpy as np
+import scipy as sp
+
+try:
+    import graph_index as gi
+except ImportError:
+    import power_system_simulation.graph_index as gi
 
 
 class EnabledEdges(IntEnum):
@@ -74,21 +94,39 @@ class EdgePairNotUniqueError(Exception):
     """
 
 
+class GraphIsFrozenError(Exception):
+    """Raises GraphIsFrozenError if the topology of a FrozenGraphProcessor is changed
+
+    Args:
+        Exception: _description_
+    """
+
+
 class GraphNotFullyConnectedError(Exception):
     """Raises GraphNotFullyConnectedError if any vertex in the graph is unreachable
 
     Args:
-        Exception: _description_
+        message: error message
+        components: vertex ids of every component that cannot be reached from the source
     """
 
+    def __init__(self, message: str, components: List[List[int]] = None) -> None:
+        super().__init__(message)
+        self.components = [] if components is None else components
+
 
 class GraphCycleError(Exception):
     """Raises GraphCycleError if any cycles in the graph are found
 
     Args:
-        Exception: _description_
+        message: error message
+        edge_ids: ids of every enabled edge that closes a cycle
     """
 
+    def __init__(self, message: str, edge_ids: List[int] = None) -> None:
+        super().__init__(message)
+        self.edge_ids = [] if edge_ids is None else edge_ids
+
 
 class EdgeAlreadyDisabledError(Exception):
     """Raises EdgeAlreadyDisabledError if find_alternative_edge function tries to disable
@@ -99,6 +137,14 @@ class EdgeAlreadyDisabledError(Exception):
     """
 
 
+class EdgeAlreadyEnabledError(Exception):
+    """Raises EdgeAlreadyEnabledError if enable_edge tries to enable an edge that is already enabled
+
+    Args:
+        Exception: _description_
+    """
+
+
 class GraphProcessor:
     """
     General documentation of this class.
@@ -140,13 +186,17 @@ class GraphProcessor:
         self.vertex_ids = vertex_ids
         self.edge_ids = edge_ids
         self.edge_vertex_id_pairs = edge_vertex_id_pairs
-        self.edge_enabled = edge_enabled
+        self.edge_enabled = list(edge_enabled)
         self.source_vertex_id = source_vertex_id
 
+        # all checks run on NumPy arrays with set operations, linear or n log n in the input size
+        vertex_array = np.array(vertex_ids, dtype=np.int64)
+        edge_array = np.array(edge_ids, dtype=np.int64)
+
         # 1. vertex_ids and edge_ids should be unique
-        if len(set(vertex_ids)) != len(vertex_ids):
+        if len(np.unique(vertex_array)) != len(vertex_array):
             raise IDNotUniqueError("Vertex IDs are not unique")
-        if len(set(edge_ids)) != len(edge_ids):
+        if len(np.unique(edge_array)) != len(edge_array):
             raise IDNotUniqueError("Edge IDs are not unique")
 
         # 2. edge_vertex_id_pairs should have the same length as edge_ids
@@ -154,82 +204,265 @@ class GraphProcessor:
             raise InputLengthDoesNotMatchError("Length of vertex-edge pairs list does not match edge ID list")
 
         # 3. edge_vertex_id_pairs should contain valid vertex ids
-        for i in range(len(edge_ids)):
-            vertex1, vertex2 = edge_vertex_id_pairs[i]
-
-            if vertex1 not in vertex_ids or vertex2 not in vertex_ids:
-                raise IDNotFoundError("Edge-vertex ID pair contains non-valid vertex ID")
+        pair_array = np.asarray(edge_vertex_id_pairs, dtype=np.int64).reshape(-1, 2)
+        if not np.isin(pair_array, vertex_array).all():
+            raise IDNotFoundError("Edge-vertex ID pair contains non-valid vertex ID")
 
         # 4. edge_enabled should have the same length as edge_ids
         if len(edge_enabled) != len(edge_ids):
             raise InputLengthDoesNotMatchError("Length of enabled edge list does not match edge ID list")
 
         # 5. source_vertex_id should be a valid vertex id
-        if source_vertex_id not in vertex_ids:
+        if not np.isin(source_vertex_id, vertex_array):
             raise IDNotFoundError("Source vertex ID is not a valid vertex ID")
 
-        # custom Errors
-        if len(edge_vertex_id_pairs) != len(set(sort_tuple_list(edge_vertex_id_pairs))):
+        # custom Errors: sort the (min, max) normalized pairs, duplicates end up next to each other
+        normalized_pairs = np.sort(pair_array, axis=1)
+        normalized_pairs = normalized_pairs[np.lexsort((normalized_pairs[:, 1], normalized_pairs[:, 0]))]
+        if (normalized_pairs[1:] == normalized_pairs[:-1]).all(axis=1).any():
             raise EdgePairNotUniqueError("Multiple edges connecting same 2 vertices found")
 
-        # 6. The graph should not contain cycles (checked inside dfs)
-        vertex_visited = []
-        vertex_parents = {}
-        adjacency_list = self.build_adjacency_list(edge_vertex_id_pairs, edge_enabled)
-        if self.dfs(adjacency_list, vertex_visited, float("Nan"), vertex_parents, source_vertex_id) == 1:
-            raise GraphCycleError("Cycle found")
+        # build the compressed sparse row (CSR) topology once
+        vertex_sorter = np.argsort(vertex_array, kind="stable")
+        edge_vertices = vertex_sorter[np.searchsorted(vertex_array, pair_array, sorter=vertex_sorter)]
+        self._topology = gi.GraphTopology(
+            vertex_array,
+            vertex_sorter,
+            edge_array,
+            np.argsort(edge_array, kind="stable"),
+            edge_vertices,
+            *self._build_csr(edge_vertices, len(vertex_array)),
+            source=int(vertex_sorter[np.searchsorted(vertex_array, source_vertex_id, sorter=vertex_sorter)]),
+        )
+        self._state = gi.GraphState(edge_enabled=np.array(edge_enabled, dtype=bool))
+
+        # 6./7. one union-find pass finds all cycle closing edges and all components
+        cycle_edges, component = self._union_find()
+        source_component = component[self._topology.source]
+
+        # 6. The graph should not contain cycles (reachable from the source)
+        if (component[self._topology.edge_vertices[cycle_edges, 0]] == source_component).any():
+            raise GraphCycleError("Cycle found", edge_ids=self._topology.edge_ids[cycle_edges].tolist())
 
         # 7. The graph should be fully connected
-        if len(vertex_visited) != len(vertex_ids):
-            raise GraphNotFullyConnectedError("Graph not fully connected. Cannot reach all vertices.")
+        unreached = np.flatnonzero(component != source_component)
+        if len(unreached) > 0:
+            unreached = unreached[np.argsort(component[unreached], kind="stable")]
+            _, starts = np.unique(component[unreached], return_index=True)
+            components = sorted(np.split(unreached, starts[1:]), key=lambda vertices: vertices[0])
+            raise GraphNotFullyConnectedError(
+                "Graph not fully connected. Cannot reach all vertices.",
+                components=[self._topology.vertex_ids[vertices].tolist() for vertices in components],
+            )
+
+        # the rooted tree index used by all queries
+        self._state = self._state._replace(tree=self.dfs(self._topology.source, self._state.edge_enabled))
 
-    def dfs(self, adjacency_list, visited, parent, parent_list, start_node) -> List[int]:
+    def _union_find(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Runs a disjoint-set (union by size, path halving) pass over the enabled edges, near-linear in size.
+
+        Returns:
+            cycle_edges: edge indices of the enabled edges that close a cycle, in edge order
+            component: representative vertex index of the component of each vertex
         """
-        Given an GraphProcessor, return Depth First Search visited nodes list and parent list.
+        root = list(range(len(self._topology.vertex_ids)))
+        size = [1] * len(self._topology.vertex_ids)
+        cycle_edges = []
+
+        def find(vertex: int) -> int:
+            while root[vertex] != vertex:
+                root[vertex] = root[root[vertex]]
+                vertex = root[vertex]
+            return vertex
+
+        enabled_edges = np.flatnonzero(self._state.edge_enabled)
+        for edge, (vertex_a, vertex_b) in zip(
+            enabled_edges.tolist(), self._topology.edge_vertices[enabled_edges].tolist()
+        ):
+            root_a, root_b = find(vertex_a), find(vertex_b)
+            if root_a == root_b:
+                cycle_edges.append(edge)
+                continue
+            if size[root_a] < size[root_b]:
+                root_a, root_b = root_b, root_a
+            root[root_b] = root_a
+            size[root_a] += size[root_b]
+
+        # point every vertex directly to its representative
+        component = np.array(root, dtype=np.int64)
+        while not np.array_equal(component[component], component):
+            component = component[component]
+
+        return np.array(cycle_edges, dtype=np.int64), component
+
+    def _rooted_tree(self) -> gi.Traversal:
+        """Returns the rooted tree of the enabled edges, with the source as root.
+
+        The tree is cached in the switching state, switching replaces both, see `_swap_tree_edge`.
+        Any edge's downstream vertices are a contiguous slice of its pre-order array.
         """
+        state = self._state
+        if state.tree is None:
+            state = state._replace(tree=self.dfs(self._topology.source, state.edge_enabled))
+            self._state = state
+        return state.tree
 
-        # start dfs from start_node
-        if start_node not in visited:  # check if node has been visited
-            visited.append(start_node)
-            parent_list[start_node] = parent  # assign parent of node
+    def _ancestor_table(self, tree: gi.Traversal) -> np.ndarray:
+        """Returns the binary lifting table of the given rooted tree, cached together with the tree.
 
-            for adjacent_vertex in adjacency_list[start_node]:
-                if adjacent_vertex != parent:
-                    if adjacent_vertex in visited:
-                        # Cycle detected, return 1
-                        return 1
-                    if self.dfs(adjacency_list, visited, start_node, parent_list, adjacent_vertex) == 1:
-                        return 1
+        table[k, vertex] is the 2**k-th ancestor of vertex, the root is its own ancestor.
+        """
+        cached = self._state.ancestors
+        if cached is not None and cached[0] is tree:
+            return cached[1]
+
+        parent = np.where(tree.parent < 0, np.arange(len(self._topology.vertex_ids)), tree.parent)
+        levels = max(1, int(tree.depth.max()).bit_length())
+        table = np.empty((levels, len(parent)), dtype=np.int64)
+        table[0] = parent
+        for k in range(1, levels):
+            table[k] = table[k - 1][table[k - 1]]
+        self._state = self._state._replace(ancestors=(tree, table))
+        return table
+
+    def _lowest_common_ancestor(self, tree: gi.Traversal, vertex_a: np.ndarray, vertex_b: np.ndarray) -> np.ndarray:
+        """Returns the lowest common ancestor in the rooted tree of each pair of vertex indices, O(log n) per pair."""
+        depth = tree.depth
+        table = self._ancestor_table(tree)
+
+        # lift the deepest vertex of each pair to the depth of the other one
+        deeper = depth[vertex_a] < depth[vertex_b]
+        vertex_a, vertex_b = np.where(deeper, vertex_b, vertex_a), np.where(deeper, vertex_a, vertex_b)
+        difference = depth[vertex_a] - depth[vertex_b]
+        for k, ancestors in enumerate(table):
+            vertex_a = np.where((difference >> k) & 1 == 1, ancestors[vertex_a], vertex_a)
+
+        # lift both vertices to just below their lowest common ancestor
+        for ancestors in table[::-1]:
+            differ = ancestors[vertex_a] != ancestors[vertex_b]
+            vertex_a = np.where(differ, ancestors[vertex_a], vertex_a)
+            vertex_b = np.where(differ, ancestors[vertex_b], vertex_b)
+
+        return np.where(vertex_a == vertex_b, vertex_a, table[0][vertex_a])
+
+    def _edge_child(self, tree: gi.Traversal, edge_index: int) -> int:
+        """Returns the downstream (child) vertex index of an enabled edge in the rooted tree."""
+        vertex_a, vertex_b = self._topology.edge_vertices[edge_index]
+        return int(vertex_b if tree.parent_edge[vertex_b] == edge_index else vertex_a)
+
+    def _vertex_index(self, vertex_id):
+        """Maps vertex IDs (scalar or array) to their dense index in `self.vertex_ids`."""
+        return self._topology.vertex_sorter[
+            np.searchsorted(self._topology.vertex_ids, vertex_id, sorter=self._topology.vertex_sorter)
+        ]
+
+    def _edge_index(self, edge_id: int) -> int:
+        """Maps an edge ID to its dense index in `self.edge_ids`.
+
+        Raises:
+            IDNotFoundError: if the edge ID does not exist
+        """
+        edge_ids, edge_sorter = self._topology.edge_ids, self._topology.edge_sorter
+        position = np.searchsorted(edge_ids, edge_id, sorter=edge_sorter)
+        if position == len(edge_ids) or edge_ids[edge_sorter[position]] != edge_id:
+            raise IDNotFoundError("Edge ID not found in graph.")
+        return int(edge_sorter[position])
 
-        # If no cycle is found
-        return 0
+    @staticmethod
+    def _build_csr(edge_vertices: np.ndarray, n_vertices: int) -> tuple:
+        """Builds an undirected CSR adjacency over all edges, enabled or not.
 
-    def build_adjacency_list(self, edge_vertex_id_pairs, edge_enabled):
-        """Given a GraphProcessor, return an undirected adjacency list using only enabled edges.
+        Every edge is stored as two arcs. The arcs of a vertex are ordered by edge index,
+        so traversals visit neighbours in the same order as the input edge list.
 
         Args:
-            edge_vertex_id_pairs: List[Tuple[int, int]]
-            edge_enabled: List[Bool]
+            edge_vertices: dense vertex indices of both ends of every edge
+            n_vertices: number of vertices
 
         Returns:
-            dict
+            offsets: arcs of vertex i are stored in [offsets[i], offsets[i + 1])
+            neighbors: vertex index at the end of each arc
+            neighbor_edges: edge index of each arc
         """
+        arc_from = edge_vertices.ravel()
+        arc_to = edge_vertices[:, ::-1].ravel()
+        arc_edge = np.repeat(np.arange(len(edge_vertices)), 2)
+
+        arc_order = np.argsort(arc_from, kind="stable")
+        offsets = np.zeros(n_vertices + 1, dtype=np.int64)
+        np.cumsum(np.bincount(arc_from, minlength=n_vertices), out=offsets[1:])
 
-        adjacency_list = {}
-        enabled_edges = [num for num, m in zip(edge_vertex_id_pairs, edge_enabled) if m]
+        return offsets, arc_to[arc_order], arc_edge[arc_order]
 
-        for edge in enabled_edges:  # cycle through edge IDs
-            u, v = edge  # tuple unpacking
+    def dfs(self, start_node: int, enabled: np.ndarray) -> gi.Traversal:
+        """
+        Depth First Search over the CSR topology, starting from vertex index start_node.
+        Only arcs of which the edge is set in the enabled mask are followed.
 
-            if u not in adjacency_list:  # check if list for vertex u exists
-                adjacency_list[u] = []
-            if v not in adjacency_list:  # check if list for vertex u exists
-                adjacency_list[v] = []
+        The search uses an explicit stack of (vertex, next arc) pairs instead of recursion,
+        so the depth of the graph is not limited by the Python recursion limit.
+        Vertices are visited in the same order as a recursive search would visit them.
 
-            adjacency_list[u].append(v)
-            adjacency_list[v].append(u)
+        Args:
+            start_node: dense vertex index to start from
+            enabled: boolean mask per edge index
 
-        return adjacency_list
+        Returns:
+            Traversal with the visiting order, parent array, depth and subtree-end indices.
+        """
+        n_vertices = len(self._topology.vertex_ids)
+        offsets = self._topology.offsets.tolist()
+        neighbors = self._topology.neighbors.tolist()
+        neighbor_edges = self._topology.neighbor_edges.tolist()
+        enabled = enabled.tolist()
+
+        # per-call scratch buffers
+        order = []
+        entry = [-1] * n_vertices
+        parent = [-1] * n_vertices
+        parent_edge = [-1] * n_vertices
+        depth = [-1] * n_vertices
+        subtree_end = [-1] * n_vertices
+
+        entry[start_node] = 0
+        depth[start_node] = 0
+        order.append(start_node)
+        stack = [start_node]
+        next_arc = [offsets[start_node]]
+
+        while stack:
+            vertex = stack[-1]
+            arc = next_arc[-1]
+
+            # all arcs of this vertex are handled, close its subtree
+            if arc == offsets[vertex + 1]:
+                subtree_end[vertex] = len(order)
+                stack.pop()
+                next_arc.pop()
+                continue
+            next_arc[-1] = arc + 1
+
+            edge = neighbor_edges[arc]
+            adjacent_vertex = neighbors[arc]
+            if edge == parent_edge[vertex] or not enabled[edge] or entry[adjacent_vertex] != -1:
+                continue
+
+            entry[adjacent_vertex] = len(order)
+            parent[adjacent_vertex] = vertex
+            parent_edge[adjacent_vertex] = edge
+            depth[adjacent_vertex] = depth[vertex] + 1
+            order.append(adjacent_vertex)
+            stack.append(adjacent_vertex)
+            next_arc.append(offsets[adjacent_vertex])
+
+        return gi.Traversal(
+            order=np.array(order, dtype=np.int64),
+            entry=np.array(entry, dtype=np.int64),
+            parent=np.array(parent, dtype=np.int64),
+            parent_edge=np.array(parent_edge, dtype=np.int64),
+            depth=np.array(depth, dtype=np.int64),
+            subtree_end=np.array(subtree_end, dtype=np.int64),
+        )
 
     def find_downstream_vertices(self, edge_id: int) -> List[int]:
         """
@@ -255,52 +488,16 @@ class GraphProcessor:
         Returns:
             A list of all downstream vertices.
         """
-        if edge_id not in self.edge_ids:
-            raise IDNotFoundError("Edge ID not found in graph.")
-
-        # step 1: run dfs to build parent list
-        vertex_visited = []
-        vertex_parents = {}
-        adjacency_list = self.build_adjacency_list(self.edge_vertex_id_pairs, self.edge_enabled)
-        self.dfs(
-            adjacency_list, vertex_visited, float("Nan"), vertex_parents, self.source_vertex_id
-        )  # cannot be cyclic, don't check
-
-        # step 2: receive disabled edge
-        index_disabled_edge = self.edge_ids.index(edge_id)
-        disabled_edge = self.edge_vertex_id_pairs[index_disabled_edge]
-
-        # step 3: choose new start point (child)
-        if disabled_edge[0] == vertex_parents[disabled_edge[1]]:
-            # if first vertex in edge is parent of second vertex, pick second (child) vertex
-            downstream_vertex_source = disabled_edge[1]
-        else:
-            # otherwise first vertex must be the child
-            downstream_vertex_source = disabled_edge[0]
+        edge_index = self._edge_index(edge_id)
+        if not self._state.edge_enabled[edge_index]:
+            return []
 
-        # step 4: set disabled edge to false
-        self.edge_enabled[index_disabled_edge] = False
+        # the downstream vertices are the subtree of the child vertex in pre-order, no traversal needed
+        tree = self._rooted_tree()
+        child = self._edge_child(tree, edge_index)
+        subtree = tree.order[tree.entry[child] : tree.subtree_end[child]]
 
-        # step 5: run dfs from new source vertex id
-        vertex_downstream_visited = []
-        vertex_downstream_parents = {}
-        adjacency_downstream_list = self.build_adjacency_list(self.edge_vertex_id_pairs, self.edge_enabled)
-
-        if downstream_vertex_source not in adjacency_downstream_list:
-            vertex_downstream_visited.append(downstream_vertex_source)
-        else:
-            self.dfs(
-                adjacency_downstream_list,
-                vertex_downstream_visited,
-                float("Nan"),
-                vertex_downstream_parents,
-                downstream_vertex_source,
-            )
-
-        # step 6: set disabled edge back to true
-        self.edge_enabled[index_disabled_edge] = True
-
-        return vertex_downstream_visited
+        return self._topology.vertex_ids[subtree].tolist()
 
     def find_alternative_edges(self, disabled_edge_id: int) -> List[int]:
         """
@@ -338,57 +535,308 @@ class GraphProcessor:
             A list of alternative edge ids.
         """
         # Step 1: Check if the disabled_edge_id is valid
-        if disabled_edge_id not in self.edge_ids:
-            raise IDNotFoundError("Edge ID not found.")
+        edge_index = self._edge_index(disabled_edge_id)
 
         # Step 2: Check if the edge corresponding to disabled_edge_id is currently enabled
-        edge_index = self.edge_ids.index(disabled_edge_id)
-        if not self.edge_enabled[edge_index]:
+        if not self._state.edge_enabled[edge_index]:
+            raise EdgeAlreadyDisabledError("Edge is already disabled.")
+
+        # Step 3: Disabling the edge splits the tree in the subtree of its child and the rest.
+        # A disabled edge reconnects the graph without a cycle exactly when its fundamental cycle
+        # (the tree path between its vertices) contains the edge, i.e. when one vertex lies in the subtree.
+        tree = self._rooted_tree()
+        child = self._edge_child(tree, edge_index)
+        candidates = np.flatnonzero(~self._state.edge_enabled)
+        position = tree.entry[self._topology.edge_vertices[candidates]]
+        in_subtree = (position >= tree.entry[child]) & (position < tree.subtree_end[child])
+
+        # Step 4: Return alternative edge ids, in edge list order
+        return [self.edge_ids[candidate] for candidate in candidates[in_subtree[:, 0] != in_subtree[:, 1]]]
+
+    def find_all_alternative_edges(self) -> sp.sparse.csr_array:
+        """
+        Runs the find_alternative_edges analysis for every enabled edge in one call (N-1 analysis).
+
+        Every disabled edge closes a fundamental cycle: enabling it is an alternative for exactly
+        the enabled edges on the tree path between its two vertices.
+        The paths are found with a binary lifting lowest common ancestor table,
+        so the map is built in O((V + D) log V) plus the size of the result.
+
+        The result is a boolean sparse matrix of shape (len(edge_ids), len(edge_ids)) in CSR format,
+        rows and columns follow the order of self.edge_ids.
+        Row i holds the alternative edges of edge i, in the same order as find_alternative_edges.
+        Rows of disabled edges are empty.
+        The matrix can be stored with scipy.sparse.save_npz.
+
+        For the example graph of find_alternative_edges:
+
+            alternatives = find_all_alternative_edges()
+            [edge_ids[j] for j in alternatives.indices[alternatives.indptr[1] : alternatives.indptr[2]]]
+
+        will return [7, 8], the alternatives of edge_3.
+
+        Returns:
+            A sparse matrix mapping each enabled edge to its alternative edges.
+        """
+        tree = self._rooted_tree()
+        candidates = np.flatnonzero(~self._state.edge_enabled)
+        vertex_a, vertex_b = self._topology.edge_vertices[candidates].T
+        top = self._lowest_common_ancestor(tree, vertex_a, vertex_b)
+
+        # walk up from both vertices to the lowest common ancestor, all candidates at once
+        rows = []
+        columns = []
+        for vertex in (vertex_a, vertex_b):
+            active = vertex != top
+            vertex, owner, stop = vertex[active], candidates[active], top[active]
+            while len(vertex) > 0:
+                rows.append(tree.parent_edge[vertex])
+                columns.append(owner)
+                vertex = tree.parent[vertex]
+                active = vertex != stop
+                vertex, owner, stop = vertex[active], owner[active], stop[active]
+
+        rows = np.concatenate(rows) if rows else np.empty(0, dtype=np.int64)
+        columns = np.concatenate(columns) if columns else np.empty(0, dtype=np.int64)
+        n_edges = len(self._topology.edge_ids)
+        alternatives = sp.sparse.csr_array(
+            (np.ones(len(rows), dtype=bool), (rows, columns)), shape=(n_edges, n_edges), dtype=bool
+        )
+        alternatives.sort_indices()
+
+        return alternatives
+
+    def enable_edge(self, edge_id: int, disabled_edge_id: int) -> None:
+        """
+        Enables a disabled edge and disables an enabled edge in the same step (switching action).
+        The graph is always a spanning tree, so enabling an edge closes a cycle
+        unless an edge of that cycle is disabled at the same time.
+
+        The rooted tree index is updated incrementally: only the subtree that changes side is re-rooted.
+
+        Args:
+            edge_id: edge id (which is currently disabled) to be enabled
+            disabled_edge_id: edge id (which is currently enabled) to be disabled
+
+        Raises:
+            IDNotFoundError: if one of the edge ids does not exist
+            EdgeAlreadyEnabledError: if edge_id is already enabled
+            EdgeAlreadyDisabledError: if disabled_edge_id is already disabled
+            GraphCycleError: if disabled_edge_id is None or not part of the cycle closed by edge_id
+        """
+        added = self._edge_index(edge_id)
+        if self._state.edge_enabled[added]:
+            raise EdgeAlreadyEnabledError("Edge is already enabled.")
+        if disabled_edge_id is None:
+            raise GraphCycleError("Cycle found", edge_ids=[edge_id])
+        removed = self._edge_index(disabled_edge_id)
+        if not self._state.edge_enabled[removed]:
+            raise EdgeAlreadyDisabledError("Edge is already disabled.")
+        if not self._reconnects(removed, added):
+            raise GraphCycleError("Cycle found", edge_ids=[edge_id])
+
+        self._swap_tree_edge(removed, added)
+
+    def disable_edge(self, edge_id: int, enabled_edge_id: int) -> None:
+        """
+        Disables an enabled edge and enables a disabled edge in the same step (switching action).
+        The graph is always a spanning tree, so disabling an edge disconnects it
+        unless one of the alternative edges (see find_alternative_edges) is enabled at the same time.
+
+        The rooted tree index is updated incrementally: only the subtree that changes side is re-rooted.
+
+        Args:
+            edge_id: edge id (which is currently enabled) to be disabled
+            enabled_edge_id: edge id (which is currently disabled) to be enabled
+
+        Raises:
+            IDNotFoundError: if one of the edge ids does not exist
+            EdgeAlreadyDisabledError: if edge_id is already disabled
+            EdgeAlreadyEnabledError: if enabled_edge_id is already enabled
+            GraphNotFullyConnectedError: if enabled_edge_id is None or not an alternative edge of edge_id
+        """
+        removed = self._edge_index(edge_id)
+        if not self._state.edge_enabled[removed]:
             raise EdgeAlreadyDisabledError("Edge is already disabled.")
+        if enabled_edge_id is not None:
+            added = self._edge_index(enabled_edge_id)
+            if self._state.edge_enabled[added]:
+                raise EdgeAlreadyEnabledError("Edge is already enabled.")
+        if enabled_edge_id is None or not self._reconnects(removed, added):
+            raise GraphNotFullyConnectedError(
+                "Graph not fully connected. Cannot reach all vertices.",
+                components=[self.find_downstream_vertices(edge_id)],
+            )
+
+        self._swap_tree_edge(removed, added)
+
+    def _reconnects(self, removed: int, added: int) -> bool:
+        """Returns True if enabling edge index added reconnects the tree after disabling edge index removed."""
+        tree = self._rooted_tree()
+        child = self._edge_child(tree, removed)
+        position = tree.entry[self._topology.edge_vertices[added]]
+        in_subtree = (position >= tree.entry[child]) & (position < tree.subtree_end[child])
+        return bool(in_subtree[0] != in_subtree[1])
+
+    def _swap_tree_edge(self, removed: int, added: int) -> None:
+        """Replaces tree edge index removed by edge index added and updates the tree index incrementally.
+
+        The subtree below the removed edge is re-rooted at the vertex of the added edge inside it
+        and spliced into the pre-order at the position a full traversal would visit it.
+        Only the moved subtree is traversed and only the part of the pre-order between its old and new position,
+        the paths to the root and the moved vertices are updated, so the cost does not grow with the graph.
+        Arrays shared with a frozen snapshot are read-only and are copied before the update.
+        """
+        tree = self._rooted_tree()
+        child = self._edge_child(tree, removed)
+        start, end = tree.entry[child], tree.subtree_end[child]
+
+        vertex_a, vertex_b = self._topology.edge_vertices[added]
+        new_child, attach = (vertex_a, vertex_b) if start <= tree.entry[vertex_a] < end else (vertex_b, vertex_a)
+
+        enabled = gi.writable(self._state.edge_enabled)
+        enabled[removed] = False
+        subtree = self._subtree_dfs(new_child, enabled)
+        enabled[added] = True
+
+        insert_at = self._insert_position(tree, child, attach, added, enabled)
+        attach_depth = tree.depth[attach]
+        order, entry, subtree_end = self._splice_pre_order(tree, child, attach, subtree, insert_at)
+
+        subtree_order, subtree_parent, subtree_parent_edge, subtree_depth, _ = subtree
+        parent = gi.writable(tree.parent)
+        parent_edge = gi.writable(tree.parent_edge)
+        depth = gi.writable(tree.depth)
+        parent[subtree_order] = subtree_parent
+        parent_edge[subtree_order] = subtree_parent_edge
+        parent[new_child] = attach
+        parent_edge[new_child] = added
+        depth[subtree_order] = subtree_depth + attach_depth + 1
+
+        self.edge_enabled[removed] = False
+        self.edge_enabled[added] = True
+        self._state = gi.GraphState(
+            edge_enabled=enabled,
+            tree=gi.Traversal(
+                order=order,
+                entry=entry,
+                parent=parent,
+                parent_edge=parent_edge,
+                depth=depth,
+                subtree_end=subtree_end,
+            ),
+        )
+
+    def _insert_position(self, tree: gi.Traversal, child: int, attach: int, added: int, enabled: np.ndarray) -> int:
+        """Returns the pre-order position of the subtree of child after it moved below attach through edge added,
+        counted without the subtree: before the first child of attach that comes later in the adjacency order."""
+        end = tree.subtree_end[child]
+        size = end - tree.entry[child]
+
+        def shifted(position: int) -> int:
+            return int(position - size if position >= end else position)
+
+        insert_at = shifted(tree.subtree_end[attach])
+        for arc in range(self._topology.offsets[attach + 1] - 1, self._topology.offsets[attach] - 1, -1):
+            edge = self._topology.neighbor_edges[arc]
+            if edge == added:
+                break
+            if enabled[edge] and edge != tree.parent_edge[attach]:
+                insert_at = shifted(tree.entry[self._topology.neighbors[arc]])
+        return insert_at
+
+    @staticmethod
+    def _splice_pre_order(tree: gi.Traversal, child: int, attach: int, subtree: tuple, insert_at: int) -> tuple:
+        """Moves the subtree of child to position insert_at of the pre-order, below attach.
+
+        Only the pre-order between the old and the new position of the subtree changes,
+        and subtree sizes only change on the paths from both ends to the root and inside the subtree.
+
+        Returns:
+            order, entry and subtree_end of the new tree
+        """
+        start, end = int(tree.entry[child]), int(tree.subtree_end[child])
+        size = end - start
+        subtree_order, _, _, _, subtree_size = subtree
+
+        paths = [[], []]
+        for path, vertex in zip(paths, (tree.parent[child], attach)):
+            while vertex != -1:
+                path.append(vertex)
+                vertex = tree.parent[vertex]
+
+        order = gi.writable(tree.order)
+        if insert_at >= start:
+            low, high = start, insert_at + size
+            order[start:insert_at] = tree.order[end:high]
+        else:
+            low, high = insert_at, end
+            order[insert_at + size : end] = tree.order[insert_at:start]
+        order[insert_at : insert_at + size] = subtree_order
+        region = order[low:high]
+
+        # take the old sizes before the arrays are updated in place
+        affected, inverse = np.unique(
+            np.concatenate((region, paths[0], paths[1])).astype(np.int64), return_inverse=True
+        )
+        sizes = tree.subtree_end[affected] - tree.entry[affected]
+        np.add.at(sizes, inverse[len(region) :], np.repeat([-size, size], [len(paths[0]), len(paths[1])]))
+
+        entry = gi.writable(tree.entry)
+        entry[region] = np.arange(low, high)
+        subtree_end = gi.writable(tree.subtree_end)
+        subtree_end[affected] = entry[affected] + sizes
+        subtree_end[subtree_order] = entry[subtree_order] + subtree_size
+
+        return order, entry, subtree_end
+
+    def _subtree_dfs(self, start_node: int, enabled: np.ndarray) -> tuple:
+        """
+        Depth First Search over a subtree that is cut off from the rest of the tree by the enabled mask,
+        starting from vertex index start_node. Vertices are visited in the same order as dfs would visit them.
+
+        Only the CSR slices of the visited vertices are read and all buffers are sized to the subtree,
+        so the cost depends on the subtree only.
+
+        Args:
+            start_node: dense vertex index to start from
+            enabled: boolean mask per edge index
 
-        self.edge_enabled[edge_index] = False
-        # List to store alternative edge ids
-        alternative_edges = []
-
-        # Step 3: Iterate through each disabled edge, check if enabling makes the graph fully connected and acyclic
-        for i, edge_enabled in enumerate(self.edge_enabled):
-            if not edge_enabled:  # Check only disabled edges
-                if self.edge_ids[i] != disabled_edge_id:
-                    # Step 4: Enable the disabled edge temporarily
-                    self.edge_enabled[i] = True
-
-                    # Step 5: Build adjacency list
-                    enabled_edge_vertex_id_pairs = []
-                    edge_enabled_short = []
-                    for j in range(len(self.edge_ids)):
-                        if self.edge_enabled[j]:
-                            enabled_edge_vertex_id_pairs.append(self.edge_vertex_id_pairs[j])
-                            edge_enabled_short.append(self.edge_enabled[j])
-                            continue
-
-                    adjacency_list = self.build_adjacency_list(enabled_edge_vertex_id_pairs, edge_enabled_short)
-
-                    # Perform Depth First Search (dfs) to check for cycles
-                    visited = []
-                    parent_list = {}
-
-                    if self.dfs(adjacency_list, visited, None, parent_list, self.source_vertex_id) == 1:
-                        # If a cycle is detected, revert the edge back to disabled and continue to the next edge
-                        self.edge_enabled[i] = False
-                    elif self.dfs(adjacency_list, visited, None, parent_list, self.source_vertex_id) == 0:
-                        # Step 6: If enabling a disabled edge satisfies the conditions,
-                        # add its edge id to the list of alternatives
-                        if len(visited) == len(self.vertex_ids):
-                            alternative_edges.append(self.edge_ids[i])
-                            self.edge_enabled[i] = False
-                        # Revert the edge back to disabled
-                        self.edge_enabled[i] = False
-
-        # Revert input edge back to enabled
-        self.edge_enabled[edge_index] = True
-
-        # Return alternative edges list
-        return alternative_edges
+        Returns:
+            order, parent, parent_edge, depth and subtree size, as arrays in visiting order
+        """
+
+        def arcs(vertex: int):
+            first, last = self._topology.offsets[vertex], self._topology.offsets[vertex + 1]
+            edges = self._topology.neighbor_edges[first:last]
+            return iter(zip(self._topology.neighbors[first:last].tolist(), edges.tolist(), enabled[edges].tolist()))
+
+        order = [start_node]
+        parent = [-1]
+        parent_edge = [-1]
+        depth = [0]
+        subtree_size = [1]
+        stack = [(0, arcs(start_node))]
+
+        while stack:
+            position, pending = stack[-1]
+            arc = next((arc for arc in pending if arc[2] and arc[1] != parent_edge[position]), None)
+
+            # all arcs of this vertex are handled, close its subtree
+            if arc is None:
+                subtree_size[position] = len(order) - position
+                stack.pop()
+                continue
+
+            adjacent_vertex, edge, _ = arc
+            parent.append(order[position])
+            parent_edge.append(edge)
+            depth.append(depth[position] + 1)
+            subtree_size.append(1)
+            order.append(adjacent_vertex)
+            stack.append((len(order) - 1, arcs(adjacent_vertex)))
+
+        return tuple(np.array(values, dtype=np.int64) for values in (order, parent, parent_edge, depth, subtree_size))
 
     def graph_plotter(self, plot_criteria=EnabledEdges) -> None:
         """Prints GraphProcessor using NetworkX.
@@ -419,23 +867,110 @@ class GraphProcessor:
 
         print(fig)
 
+    def save(self, path: str) -> None:
+        """
+        Saves the validated topology and all indexes to a versioned binary file,
+        which can be loaded with FrozenGraphProcessor.load without validating or traversing again.
 
-# other functions not dependent on specific class
+        Every array is stored raw and aligned, so it can be opened zero-copy with np.memmap,
+        see graph_index.write_index_file for the layout.
 
+        Args:
+            path: file to write
+        """
+        self._ancestor_table(self._rooted_tree())
+        gi.save_index(path, self._topology, self._state)
 
-def sort_tuple_list(edge_vertex_id_pairs) -> List[Tuple[int, int]]:
-    """Sorts the edge_vertex_id_pairs tuple list of GraphProcessor class.
-    Args:
-        edge_vertex_id_pairs: List[Tuple[int, int]]
+    def freeze(self) -> "FrozenGraphProcessor":
+        """Returns an immutable snapshot of the current graph, see FrozenGraphProcessor.
 
-    Returns:
-        List[Tuple[int, int]]
+        The snapshot shares the index arrays with this graph, nothing is validated or traversed again.
+        Later switching actions on this graph do not affect the snapshot.
+        """
+        frozen = FrozenGraphProcessor.__new__(FrozenGraphProcessor)
+        frozen.__dict__.update(self.__dict__)
+        frozen.seal()
+        return frozen
+
+
+class FrozenGraphProcessor(GraphProcessor):
     """
+    Immutable variant of GraphProcessor that can be shared between threads or asyncio tasks without copies or locks.
 
-    # sort each tuple in ascending order
-    sorted_tuple_list = [tuple(sorted(t)) for t in edge_vertex_id_pairs]
+    All indexes, including the lowest common ancestor table, are built upon initialization
+    and all arrays are read-only. Queries only read the shared indexes and keep their working state
+    in per-call buffers. The switching methods enable_edge and disable_edge raise GraphIsFrozenError.
 
-    # sort each tuple based on initial value
-    sorted_tuple_list = sorted(sorted_tuple_list, key=lambda x: x[0])
+    Create one with the same arguments as GraphProcessor, or take a snapshot with GraphProcessor.freeze().
+    """
 
-    return sorted_tuple_list
+    def __init__(
+        self,
+        vertex_ids: List[int],
+        edge_ids: List[int],
+        edge_vertex_id_pairs: List[Tuple[int, int]],
+        edge_enabled: List[bool],
+        source_vertex_id: int,
+    ) -> None:
+        """Validates the graph like GraphProcessor and seals it."""
+        super().__init__(vertex_ids, edge_ids, edge_vertex_id_pairs, edge_enabled, source_vertex_id)
+        self.seal()
+
+    def seal(self) -> None:
+        """Builds all lazy indexes and makes the graph read-only."""
+        tree = self._rooted_tree()
+        self._ancestor_table(tree)
+
+        self.vertex_ids = tuple(self.vertex_ids)
+        self.edge_ids = tuple(self.edge_ids)
+        self.edge_vertex_id_pairs = tuple(tuple(pair) for pair in self.edge_vertex_id_pairs)
+        self.edge_enabled = tuple(self.edge_enabled)
+
+        arrays = [value for value in self._topology if isinstance(value, np.ndarray)]
+        arrays += list(tree)
+        arrays += [self._state.edge_enabled, self._state.ancestors[1]]
+        for array in arrays:
+            array.flags.writeable = False
+
+    @classmethod
+    def load(cls, path: str) -> "FrozenGraphProcessor":
+        """
+        Loads a graph saved with GraphProcessor.save. The arrays are memory-mapped read-only,
+        so worker processes share one on-disk index and start without validation or traversal.
+
+        The public attributes vertex_ids, edge_ids, edge_vertex_id_pairs and edge_enabled
+        are read-only NumPy arrays instead of lists.
+
+        Args:
+            path: file written by GraphProcessor.save
+
+        Returns:
+            FrozenGraphProcessor
+
+        Raises:
+            InvalidGraphFileError: if the file is not a graph index file or has an unsupported version
+        """
+        topology, state, edge_vertex_id_pairs = gi.load_index(path)
+
+        graph = cls.__new__(cls)
+        graph.__dict__.update(
+            {
+                "vertex_ids": topology.vertex_ids,
+                "edge_ids": topology.edge_ids,
+                "edge_vertex_id_pairs": edge_vertex_id_pairs,
+                "edge_enabled": state.edge_enabled,
+                "source_vertex_id": int(topology.vertex_ids[topology.source]),
+                "_topology": topology,
+                "_state": state,
+            }
+        )
+
+        return graph
+
+    def enable_edge(self, edge_id: int, disabled_edge_id: int) -> None:
+        """The topology of a frozen graph cannot change, raises GraphIsFrozenError."""
+        raise GraphIsFrozenError(f"Cannot switch edges {edge_id} and {disabled_edge_id}, the graph is frozen.")
+
+    def disable_edge(self, edge_id: int, enabled_edge_id: int) -> None:
+        """The topology of a frozen graph cannot change, raises GraphIsFrozenError."""
+        raise GraphIsFrozenError(f"Cannot switch edges {edge_id} and {enabled_edge_id}, the graph is frozen.")
@@ -0,0 +1,131 @@
+"""
+`n1_analysis.py` contains the helper functions of the N-1 contingency analysis of `PowerSim`.
+
+The module contains:
+1. `n1_scenarios(graph: graph_processing.GraphProcessor, line_ids: np.ndarray) -> tuple`
+2. `n1_line_status(disabled_ids: np.ndarray, alternative_ids: np.ndarray) -> np.ndarray`
+3. `n1_loading_table(alt_line_ids: np.ndarray, line_data: np.ndarray, timestamps: pd.Index) -> pd.DataFrame`
+4. `n1_contingency_table(scenario_tables: list, contingency_ids: np.ndarray) -> pd.DataFrame`
+"""
+
+import numpy as np
+import pandas as pd
+from power_grid_model import initialize_array
+
+try:
+    import graph_processing as gp
+except ImportError:
+    import power_system_simulation.graph_processing as gp
+
+
+def n1_scenarios(graph: gp.GraphProcessor, line_ids: np.ndarray) -> tuple:
+    """Lists the N-1 scenarios of all enabled lines: one per (disabled line, alternative line) pair,
+    in the order of find_all_alternative_edges. Edges that are not lines, like the transformer, are skipped.
+
+    Args:
+        graph: graph of the grid
+        line_ids: line IDs of the grid
+
+    Returns:
+        tuple: (contingency_ids, disabled_ids, alternative_ids), the IDs of all enabled lines and
+            the disabled and alternative line ID per scenario
+    """
+    edge_ids = np.asarray(graph.edge_ids)
+    is_line = np.isin(edge_ids, line_ids)
+    enabled_lines = np.flatnonzero(is_line & np.asarray(graph.edge_enabled, dtype=bool))
+
+    alternatives = graph.find_all_alternative_edges()[enabled_lines].tocsr()
+    scenario_edges = np.repeat(enabled_lines, np.diff(alternatives.indptr))
+    keep = is_line[alternatives.indices]
+
+    return (
+        edge_ids[enabled_lines].astype(line_ids.dtype),
+        edge_ids[scenario_edges[keep]].astype(line_ids.dtype),
+        edge_ids[alternatives.indices[keep]].astype(line_ids.dtype),
+    )
+
+
+def n1_line_status(disabled_ids: np.ndarray, alternative_ids: np.ndarray) -> np.ndarray:
+    """Creates the line update of N-1 scenarios: the disabled line opened and the alternative line closed.
+
+    Args:
+        disabled_ids: disabled line ID per scenario
+        alternative_ids: alternative line ID per scenario
+
+    Returns:
+        np.ndarray: line update array of shape (scenarios, 2)
+    """
+    line_status = initialize_array("update", "line", (len(disabled_ids), 2))
+    line_status["id"][:, 0] = disabled_ids
+    line_status["from_status"][:, 0] = 0
+    line_status["to_status"][:, 0] = 0
+    line_status["id"][:, 1] = alternative_ids
+    line_status["from_status"][:, 1] = 1
+    line_status["to_status"][:, 1] = 1
+    return line_status
+
+
+def n1_loading_table(alt_line_ids: np.ndarray, line_data: np.ndarray, timestamps: pd.Index) -> pd.DataFrame:
+    """Summarizes the maximum line loading of every N-1 scenario.
+    Ties go to the first line and the first timestamp, like the loading table.
+
+    Args:
+        alt_line_ids: alternative line ID per scenario
+        line_data: line output of shape (scenarios, timestamps, lines)
+        timestamps: timestamps of the power profiles
+
+    Returns:
+        pd.DataFrame: one row per scenario with the alternative line ID, the maximum loading,
+            the line ID of this maximum and the timestamp of this maximum
+    """
+    loading = line_data["loading"]
+    scenarios = np.arange(loading.shape[0])
+
+    line_max_loading = loading.max(axis=1)
+    line_max_position = loading.argmax(axis=1)
+    max_line = line_max_loading.argmax(axis=1)
+
+    return pd.DataFrame(
+        {
+            "Alternative_Line_ID": alt_line_ids,
+            "Max_Loading": line_max_loading[scenarios, max_line],
+            "Max_Loading_ID": line_data["id"][scenarios, 0, max_line],
+            "Max_Loading_Timestamp": timestamps[line_max_position[scenarios, max_line]],
+        }
+    )
+
+
+def n1_contingency_table(scenario_tables: list, contingency_ids: np.ndarray) -> pd.DataFrame:
+    """Ranks N-1 contingencies by the maximum loading of their best alternative.
+
+    Args:
+        scenario_tables: tables with one row per (disabled line, alternative line) scenario,
+            with the columns of n1_loading_table, Disabled_Line_ID and Screened
+        contingency_ids: line IDs of all contingencies, including those without alternatives
+
+    Returns:
+        pd.DataFrame: one row per contingency, sorted by Max_Loading from high to low,
+            contingencies without alternative last
+    """
+    columns = ["Alternative_Line_ID", "Max_Loading", "Max_Loading_ID", "Max_Loading_Timestamp", "Screened"]
+    table = pd.DataFrame({"Disabled_Line_ID": contingency_ids, "Alternatives": 0})
+
+    if len(scenario_tables) == 0:
+        scenario_tables = [
+            pd.DataFrame({"Disabled_Line_ID": pd.Series(dtype=np.int64)} | {column: [] for column in columns})
+        ]
+
+    # scenario tables are indexed by scenario number, ties go to the first alternative,
+    # a later result of the same scenario (Newton-Raphson after screening) replaces the earlier one
+    scenarios = pd.concat(scenario_tables)
+    scenarios = scenarios[~scenarios.index.duplicated(keep="last")].sort_index()
+    grouped = scenarios.groupby("Disabled_Line_ID", sort=False)
+    best = scenarios.loc[grouped["Max_Loading"].idxmin()].set_index("Disabled_Line_ID")[columns]
+
+    table["Alternatives"] = table["Disabled_Line_ID"].map(grouped.size()).fillna(0).astype(np.int64)
+    table = table.join(best, on="Disabled_Line_ID")
+    # nullable integers and booleans, contingencies without alternative have no line IDs and no screening
+    table[["Alternative_Line_ID", "Max_Loading_ID"]] = table[["Alternative_Line_ID", "Max_Loading_ID"]].astype("Int64")
+    table["Screened"] = table["Screened"].astype("boolean")
+
+    return table.sort_values("Max_Loading", ascending=False, kind="stable", na_position="last").reset_index(drop=True)
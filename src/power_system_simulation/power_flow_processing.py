@@ -1,20 +1,29 @@
 """
-`power_flow_processing.py` contains the class `PowerFlow`. 
+`power_flow_processing.py` contains the class `PowerFlow`.
 This class defines and validates a grid based on `power_grid_model.PowerGridModel`
 
 It is initialized with parameters:
-`def __init__(self, grid_data: dict) -> None`
+`def __init__(self, grid_data: dict, validation=FullValidation, cache=None) -> None`
 
-`grid_data` must be provided in `power_grid_model` format. Refer to: 
+`grid_data` must be provided in `power_grid_model` format. Refer to:
 https://power-grid-model.readthedocs.io/en/stable/quickstart.html#input-data
 
 The object saves:
 1. `self.model`
 2. `self.grid_data`
+3. `self.validation`
+4. `self.validation_time` and `self.calculation_time` (seconds spent so far)
+5. `self.cache`: optional `PowerFlowResultCache` shared between objects, batch results are looked up there first
 
-The class contains the functions: 
+`validation` is one of:
+- `FullValidation`: validate the grid and every batch update (default)
+- `ValidateOnce`: validate each unique dataset once per process, keyed by a content hash
+- `NoValidation`: skip validation
+
+The class contains the functions:
 1. `batch_powerflow(`
-   `     self, active_power_profile: pd.DataFrame, reactive_power_profile: pd.DataFrame, tap_value=0`
+   `     self, active_power_profile: pd.DataFrame, reactive_power_profile: pd.DataFrame, tap_value=0,`
+   `     *, output_component_types=None`
    ` ) -> dict`
 2. `aggregate_voltage_table(`
    `     self, active_power_profile: pd.DataFrame, reactive_power_profile: pd.DataFrame`
@@ -22,11 +31,42 @@ The class contains the functions:
 3. `aggregate_loading_table(`
    `     self, active_power_profile: pd.DataFrame, reactive_power_profile: pd.DataFrame, tap_value=0`
    ` ) -> pd.DataFrame`
+4. `tap_sweep(self, active_power_profile, reactive_power_profile, tap_values, *, output_component_types=None)`
+   `-> dict`
+   calculates all combinations of timestamp and tap position in one batch
+5. `scenario_sweep(self, active_power_profile, reactive_power_profile, scenario_update: dict, *,`
+   `output_component_types=None, calculation_method=CalculationMethod.newton_raphson, threads: int = 0) -> dict`
+   calculates all combinations of timestamp and scenario (e.g. line statuses) in one batch
+6. `aggregate_tables(`
+   `     self, active_power_profile, reactive_power_profile, tap_value=0,`
+   `     *, reductions: dict = None, chunk_size: int = None, output_component_types=None`
+   ` ) -> dict`
+   runs the batch power flow once for both tables and any extra reductions,
+   optionally in chunks of timestamps and calculating only the needed output components
+7. `load_update(self, active_power_profile, reactive_power_profile) -> dict`
+8. `calculate_batch(self, update_data: dict, output_component_types=None, calculation_method=..., *, threads=0)`
+   `-> dict`
+9. `profile_axes(self, profile) -> tuple`
+10. `copy(self) -> PowerFlow`
+
+`PowerFlowResultCache(max_bytes=256 * 2**20, directory=None)` is an LRU cache of batch results in memory,
+with an optional memory-mapped .npy tier on disk.
+
+Power profiles are DataFrames with timestamps as index and load IDs as columns,
+or 2D NumPy arrays with the loads in `grid_data["sym_load"]` order.
 """
 
+import copy
+import hashlib
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from enum import IntEnum
+
 import numpy as np
 import pandas as pd
-import scipy as sp
 from power_grid_model import CalculationMethod, CalculationType, PowerGridModel, initialize_array
 from power_grid_model.validation import assert_valid_batch_data, assert_valid_input_data
 
@@ -43,6 +83,31 @@ class LoadIDMismatch(Exception):
     """Raises error if load IDs of power profiles do no not match"""
 
 
+class InvalidValidationModeError(Exception):
+    """Raises InvalidValidationModeError if the validation mode is not FullValidation, ValidateOnce or NoValidation
+
+    Args:
+        Exception: _description_
+    """
+
+
+class FullValidation(IntEnum):
+    """Validation mode: validate the grid and every batch update"""
+
+
+class ValidateOnce(IntEnum):
+    """Validation mode: validate each unique dataset once per process"""
+
+
+class NoValidation(IntEnum):
+    """Validation mode: skip validation"""
+
+
+# content hashes of datasets that passed validation in this process
+_validated_datasets = set()
+_validated_datasets_lock = threading.Lock()
+
+
 class PowerFlow:
     """
     In this class are the functionalities of assignment 2,
@@ -50,32 +115,178 @@ class PowerFlow:
     the voltage table and loading table
     """
 
-    def __init__(self, grid_data: dict) -> None:
+    def __init__(self, grid_data: dict, validation=FullValidation, cache=None) -> None:
         """Load and validate grid_data in class 'PowerFlow' upon instantiation
 
         Args:
             grid_data: Power grid input data. Class dict.
+            validation: FullValidation, ValidateOnce or NoValidation. Defaults to FullValidation.
+            cache: optional PowerFlowResultCache for batch results.
         """
-
-        assert_valid_input_data(input_data=grid_data, symmetric=True, calculation_type=CalculationType.power_flow)
+        if validation not in (FullValidation, ValidateOnce, NoValidation):
+            raise InvalidValidationModeError("Validation mode must be FullValidation, ValidateOnce or NoValidation")
+
+        self.validation = validation
+        self.validation_time = 0.0
+        self.calculation_time = 0.0
+
+        self.validate(
+            assert_valid_input_data,
+            input_data=grid_data,
+            symmetric=True,
+            calculation_type=CalculationType.power_flow,
+        )
 
         self.grid_data = grid_data
 
         self.model = PowerGridModel(self.grid_data)
 
+        # the model keeps its own copy of the grid, so the cache key is taken from the grid as it is now,
+        # also without a cache because one can be assigned later
+        self.cache = cache
+        self._grid_hash = dataset_hash(grid_data)
+
+    def copy(self):
+        """Returns a PowerFlow on the same grid with its own PowerGridModel, e.g. for use in another thread.
+        The grid data, validation mode and cache are shared, the timers start at zero.
+
+        Returns:
+            PowerFlow: the copy
+        """
+        power_flow = copy.copy(self)
+        power_flow.model = self.model.copy()
+        power_flow.validation_time = 0.0
+        power_flow.calculation_time = 0.0
+        return power_flow
+
     def batch_powerflow(
-        self, active_power_profile: pd.DataFrame, reactive_power_profile: pd.DataFrame, tap_value=0
+        self,
+        active_power_profile: pd.DataFrame,
+        reactive_power_profile: pd.DataFrame,
+        tap_value=0,
+        *,
+        output_component_types=None,
     ) -> dict:
         """
         Create a batch update dataset and calculate power flow.
 
         Args:
             active_power_profile: DataFrame with columns ['Timestamp', '8', '9', '10', ...]
+                or NumPy array of shape (timestamps, loads) with the loads in grid_data order
             reactive_power_profile: DataFrame with columns ['Timestamp', '8', '9', '10', ...]
+                or NumPy array of shape (timestamps, loads) with the loads in grid_data order
+            tap_value: transformer tap position, 0 keeps the tap position of grid_data
+            output_component_types: optional component types to return, e.g. {"node", "line"}.
+                Defaults to all component types.
 
         Returns:
             pd.DataFrame: Power flow solution data.
         """
+        update_data = self.load_update(active_power_profile, reactive_power_profile)
+
+        # Construct the update data
+        if tap_value != 0:
+            tap_profile = initialize_array("update", "transformer", (update_data["sym_load"].shape[0], 1))
+            tap_profile["id"] = self.grid_data["transformer"]["id"]
+            tap_profile["tap_pos"] = tap_value
+
+            update_data["transformer"] = tap_profile
+
+        return self.calculate_batch(update_data, output_component_types=output_component_types)
+
+    def tap_sweep(
+        self,
+        active_power_profile: pd.DataFrame,
+        reactive_power_profile: pd.DataFrame,
+        tap_values,
+        *,
+        output_component_types=None,
+    ) -> dict:
+        """
+        Calculates power flow for every combination of timestamp and transformer tap position in one batch.
+
+        Args:
+            active_power_profile: DataFrame with columns ['Timestamp', '8', '9', '10', ...]
+            reactive_power_profile: DataFrame with columns ['Timestamp', '8', '9', '10', ...]
+            tap_values: tap positions to calculate, applied to every transformer
+            output_component_types: optional component types to return. Defaults to all component types.
+
+        Returns:
+            dict: Power flow solution data, every array has shape (tap positions, timestamps, components).
+        """
+        tap_values = np.asarray(tap_values)
+        tap_profile = initialize_array("update", "transformer", (len(tap_values), len(self.grid_data["transformer"])))
+        tap_profile["id"] = self.grid_data["transformer"]["id"]
+        tap_profile["tap_pos"] = tap_values[:, np.newaxis]
+
+        return self.scenario_sweep(
+            active_power_profile,
+            reactive_power_profile,
+            {"transformer": tap_profile},
+            output_component_types=output_component_types,
+        )
+
+    def scenario_sweep(
+        self,
+        active_power_profile: pd.DataFrame,
+        reactive_power_profile: pd.DataFrame,
+        scenario_update: dict,
+        *,
+        output_component_types=None,
+        calculation_method=CalculationMethod.newton_raphson,
+        threads: int = 0,
+    ) -> dict:
+        """
+        Calculates power flow for every combination of timestamp and scenario in one batch.
+        A scenario is one row of update arrays, e.g. a tap position or a set of line statuses,
+        applied on top of the power profiles at every timestamp.
+
+        Args:
+            active_power_profile: DataFrame with columns ['Timestamp', '8', '9', '10', ...]
+            reactive_power_profile: DataFrame with columns ['Timestamp', '8', '9', '10', ...]
+            scenario_update: update data with arrays of shape (scenarios, components), not including sym_load
+            output_component_types: optional component types to return. Defaults to all component types.
+            calculation_method: power flow method, e.g. CalculationMethod.linear for a fast estimate.
+                Defaults to Newton-Raphson.
+            threads: power_grid_model threading of the batch, see calculate_batch.
+
+        Returns:
+            dict: Power flow solution data, every array has shape (scenarios, timestamps, components).
+        """
+        load_profile = self.load_update(active_power_profile, reactive_power_profile)["sym_load"]
+        n_timestamps = load_profile.shape[0]
+        n_scenarios = len(next(iter(scenario_update.values())))
+
+        update_data = {"sym_load": np.tile(load_profile, (n_scenarios, 1))}
+        for component, array in scenario_update.items():
+            update_data[component] = np.repeat(array, n_timestamps, axis=0)
+
+        output_data = self.calculate_batch(
+            update_data,
+            output_component_types=output_component_types,
+            calculation_method=calculation_method,
+            threads=threads,
+        )
+
+        return {
+            component: array.reshape(n_scenarios, n_timestamps, array.shape[-1])
+            for component, array in output_data.items()
+        }
+
+    def load_update(self, active_power_profile: pd.DataFrame, reactive_power_profile: pd.DataFrame) -> dict:
+        """
+        Creates the sym_load batch update of a pair of power profiles.
+
+        The update arrays are filled directly from the float64 block of the profiles,
+        no Python objects are created per value.
+
+        Args:
+            active_power_profile: DataFrame with columns ['Timestamp', '8', '9', '10', ...]
+            reactive_power_profile: DataFrame with columns ['Timestamp', '8', '9', '10', ...]
+
+        Returns:
+            dict: update data with the "sym_load" array of shape (timestamps, loads)
+        """
         # check if any power profile is provided
         if active_power_profile is None:
             raise PowerProfileNotFound("No active power profile provided.")
@@ -83,56 +294,206 @@ class PowerFlow:
         if reactive_power_profile is None:
             raise PowerProfileNotFound("No reactive power profile provided.")
 
+        timestamps, load_ids = self.profile_axes(active_power_profile)
+        reactive_timestamps, reactive_load_ids = self.profile_axes(reactive_power_profile)
+
         # check if timestamps are equal in value and lengths
-        if active_power_profile.index.to_list() != reactive_power_profile.index.to_list():
+        if not timestamps.equals(reactive_timestamps):
             raise TimestampMismatch("Timestamps of active and reactive power profiles do not match.")
 
-        if active_power_profile.columns.to_list() != reactive_power_profile.columns.to_list():
+        if not load_ids.equals(reactive_load_ids):
             raise LoadIDMismatch("Load IDs in given power profiles do not match")
 
-        load_profile = initialize_array(
-            "update",
-            "sym_load",
-            (len(active_power_profile.index.to_list()), len(active_power_profile.columns.to_list())),
-        )
+        load_profile = initialize_array("update", "sym_load", (len(timestamps), len(load_ids)))
 
-        load_profile["id"] = active_power_profile.columns.tolist()
-        load_profile["p_specified"] = active_power_profile.values.tolist()
-        load_profile["q_specified"] = reactive_power_profile.values.tolist()
+        load_profile["id"] = load_ids.to_numpy()
+        load_profile["p_specified"] = profile_values(active_power_profile)
+        load_profile["q_specified"] = profile_values(reactive_power_profile)
 
-        # Construct the update data
-        if tap_value != 0:
-            tap_profile = initialize_array("update", "transformer", (len(active_power_profile.values.tolist()), 1))
-            tap_profile["id"] = self.grid_data["transformer"]["id"]
-            tap_profile["tap_pos"] = tap_value
+        return {"sym_load": load_profile}
 
-            update_data = {"sym_load": load_profile, "transformer": tap_profile}
+    def calculate_batch(
+        self,
+        update_data: dict,
+        output_component_types=None,
+        calculation_method=CalculationMethod.newton_raphson,
+        *,
+        threads: int = 0,
+    ) -> dict:
+        """
+        Validates the batch update data and calculates power flow, or returns the result from the cache.
 
-        else:
-            update_data = {"sym_load": load_profile}
+        Args:
+            update_data: power_grid_model batch update data
+            output_component_types: optional component types to return. Defaults to all component types.
+            calculation_method: power flow method. Defaults to Newton-Raphson.
+            threads: power_grid_model threading, 0 uses all hardware threads (default), -1 calculates sequentially,
+                e.g. for batches that already run in a thread pool, and n > 0 uses n threads.
+
+        Returns:
+            dict: Power flow solution data.
+        """
+        cache_key = None
+        if self.cache is not None:
+            cache_key = dataset_hash(
+                self._grid_hash,
+                update_data,
+                calculation_method,
+                None if output_component_types is None else sorted(output_component_types),
+            )
+            output_data = self.cache.get(cache_key)
+            if output_data is not None:
+                return output_data
 
         # Validate batch data
-        assert_valid_batch_data(
-            input_data=self.grid_data, update_data=update_data, calculation_type=CalculationType.power_flow
+        self.validate(
+            assert_valid_batch_data,
+            input_data=self.grid_data,
+            update_data=update_data,
+            calculation_type=CalculationType.power_flow,
         )
 
-        # Run Newton-Raphson power flow
+        # Run power flow, Newton-Raphson by default
+        start = time.perf_counter()
         output_data = self.model.calculate_power_flow(
-            update_data=update_data, calculation_method=CalculationMethod.newton_raphson, threading=0
+            update_data=update_data,
+            calculation_method=calculation_method,
+            threading=threads,
+            output_component_types=output_component_types,
         )
+        self.calculation_time += time.perf_counter() - start
+
+        if cache_key is not None:
+            output_data = self.cache.put(cache_key, output_data)
 
         return output_data
 
+    def validate(self, validator, **kwargs) -> None:
+        """
+        Runs a power_grid_model validator according to the validation mode of this object.
+        With ValidateOnce, datasets that passed before in this process are skipped.
+        The time spent is added to self.validation_time.
+
+        Args:
+            validator: assert_valid_input_data or assert_valid_batch_data
+            **kwargs: arguments of the validator
+        """
+        if self.validation == NoValidation:
+            return
+
+        start = time.perf_counter()
+        key = None
+        if self.validation == ValidateOnce:
+            key = dataset_hash(validator.__name__, kwargs)
+            with _validated_datasets_lock:
+                if key in _validated_datasets:
+                    self.validation_time += time.perf_counter() - start
+                    return
+
+        validator(**kwargs)
+
+        if key is not None:
+            with _validated_datasets_lock:
+                _validated_datasets.add(key)
+        self.validation_time += time.perf_counter() - start
+
+    def profile_axes(self, profile) -> tuple:
+        """
+        Returns the timestamps and load IDs of a power profile.
+        A NumPy array profile has no labels: its rows are numbered and its columns are the loads in grid_data order.
+
+        Args:
+            profile: DataFrame with timestamps as index and load IDs as columns, or NumPy array
+
+        Returns:
+            tuple: (timestamps, load_ids) as pd.Index
+        """
+        if isinstance(profile, pd.DataFrame):
+            return profile.index, profile.columns
+
+        load_ids = self.grid_data["sym_load"]["id"]
+        if np.ndim(profile) != 2 or np.shape(profile)[1] != len(load_ids):
+            raise LoadIDMismatch("Power profile array does not have a column for every load in the grid")
+        return pd.RangeIndex(np.shape(profile)[0], name="Timestamp"), pd.Index(load_ids)
+
+    def aggregate_tables(
+        self,
+        active_power_profile: pd.DataFrame,
+        reactive_power_profile: pd.DataFrame,
+        tap_value=0,
+        *,
+        reductions: dict = None,
+        chunk_size: int = None,
+        output_component_types=None,
+    ) -> dict:
+        """
+        Runs one batch power flow and aggregates the voltage table and the loading table from the same output.
+        Extra reductions are evaluated on the same output as well.
+
+        With chunk_size, the timestamps are calculated chunk by chunk and folded into running reductions,
+        so only one chunk of output is held in memory. The tables are exactly equal to the unchunked ones.
+        Extra reductions are called per chunk. A reduction declares how two chunk results are folded
+        in a `combine` attribute, e.g. `max` or `operator.add`, and then returns one result for any chunk size.
+        The result of a reduction without it is the list of its chunk results, with one element without chunking.
+
+        Only the component types needed by the tables and reductions are calculated into the output.
+        A reduction declares its component types in a `output_component_types` attribute,
+        a reduction without it gets the full output.
+
+        Args:
+            active_power_profile: DataFrame with columns ['Timestamp', '8', '9', '10', ...]
+            reactive_power_profile: DataFrame with columns ['Timestamp', '8', '9', '10', ...]
+            tap_value: transformer tap position, 0 keeps the tap position of grid_data
+            reductions: optional dict of name -> function(output_data, timestamps),
+                with optional attributes `output_component_types` and `combine`
+            chunk_size: optional number of timestamps per power flow calculation
+            output_component_types: optional component types to calculate in addition to "node" and "line".
+                Defaults to the component types of the reductions.
+
+        Returns:
+            dict: "voltage_table", "loading_table" and the result of every requested reduction by name.
+        """
+        timestamps = self.profile_axes(active_power_profile)[0]
+        if chunk_size is None:
+            chunk_size = max(len(timestamps), 1)
+        if chunk_size < 1:
+            raise ValueError("chunk_size must be a positive number of timestamps")
+
+        reductions = reductions or {}
+        output_component_types = required_output_components(reductions, output_component_types)
+        voltage_tables = []
+        loading = LoadingTableAccumulator()
+        reduced = {name: None if hasattr(reduction, "combine") else [] for name, reduction in reductions.items()}
+
+        for start in range(0, len(timestamps), chunk_size):
+            chunk = slice(start, start + chunk_size)
+            output_data = self.batch_powerflow(
+                active_power_profile=profile_rows(active_power_profile, chunk),
+                reactive_power_profile=profile_rows(reactive_power_profile, chunk),
+                tap_value=tap_value,
+                output_component_types=output_component_types,
+            )
+            voltage_tables.append(voltage_table_from_output(output_data, timestamps[chunk]))
+            loading.add(output_data)
+            for name, reduction in reductions.items():
+                result = reduction(output_data, timestamps[chunk])
+                if not hasattr(reduction, "combine"):
+                    reduced[name].append(result)
+                else:
+                    reduced[name] = result if start == 0 else reduction.combine(reduced[name], result)
+
+        return {
+            "voltage_table": pd.concat(voltage_tables) if len(voltage_tables) > 1 else voltage_tables[0],
+            "loading_table": loading.table(timestamps),
+            **reduced,
+        }
+
     def aggregate_voltage_table(
         self, active_power_profile: pd.DataFrame, reactive_power_profile: pd.DataFrame
     ) -> pd.DataFrame:
         """
         Aggregates power flow results into a table with voltage information.
-        The table contains the timestamp as index and displays the following information per timestamp:
-        - Maximum p.u. voltage of all the nodes for this timestamp
-        - The node ID with the maximum p.u. voltage
-        - Minimum p.u. voltage of all the nodes for this timestamp
-        - The node ID with the minimum p.u. voltage
+        See `voltage_table_from_output`.
 
         Args:
             active_power_profile: DataFrame with columns ['Timestamp', '8', '9', '10', ...]
@@ -141,44 +502,14 @@ class PowerFlow:
         Returns:
             voltage_table: DataFrame with voltage information.
         """
-
-        output_data = self.batch_powerflow(
-            active_power_profile=active_power_profile, reactive_power_profile=reactive_power_profile
-        )
-
-        node_data = output_data["node"]
-        voltage_data = node_data["u_pu"]
-
-        max_voltage = voltage_data.max(axis=1)
-        max_voltage_node = node_data["id"][np.arange(voltage_data.shape[0]), voltage_data.argmax(axis=1)]
-        min_voltage = voltage_data.min(axis=1)
-        min_voltage_node = node_data["id"][np.arange(voltage_data.shape[0]), voltage_data.argmin(axis=1)]
-
-        voltage_table = pd.DataFrame(
-            {
-                "Timestamp": active_power_profile.index,
-                "Max_Voltage": max_voltage,
-                "Max_Voltage_Node": max_voltage_node,
-                "Min_Voltage": min_voltage,
-                "Min_Voltage_Node": min_voltage_node,
-            }
-        )
-
-        voltage_table.set_index("Timestamp", inplace=True)
-
-        return voltage_table
+        return self.aggregate_tables(active_power_profile, reactive_power_profile)["voltage_table"]
 
     def aggregate_loading_table(
         self, active_power_profile: pd.DataFrame, reactive_power_profile: pd.DataFrame, tap_value=0
     ) -> pd.DataFrame:
         """
         Aggregates power flow results into a table with line loading information.
-        The table contains the line ID as index and displays the following information per line:
-        - Energy loss of the line across the timeline in kWh
-        - Maximum loading in p.u. of the line across the whole timeline
-        - Timestamp of this maximum loading moment
-        - Minimum loading in p.u. of the line across the whole timeline
-        - Timestamp of this minimum loading moment
+        See `loading_table_from_output`.
 
         Args:
             active_power_profile: DataFrame with columns ['Timestamp', '8', '9', '10', ...]
@@ -187,47 +518,356 @@ class PowerFlow:
         Returns:
             loading_table: DataFrame with loading information.
         """
+        return self.aggregate_tables(active_power_profile, reactive_power_profile, tap_value=tap_value)["loading_table"]
 
-        output_data = self.batch_powerflow(
-            active_power_profile=active_power_profile,
-            reactive_power_profile=reactive_power_profile,
-            tap_value=tap_value,
-        )
 
-        line_data = output_data["line"]
-        line_ids = line_data["id"][0, :]
+# other functions not dependent on specific class
+def voltage_table_from_output(output_data: dict, timestamps: pd.Index) -> pd.DataFrame:
+    """
+    Aggregates batch power flow output into a table with voltage information.
+    The table contains the timestamp as index and displays the following information per timestamp:
+    - Maximum p.u. voltage of all the nodes for this timestamp
+    - The node ID with the maximum p.u. voltage
+    - Minimum p.u. voltage of all the nodes for this timestamp
+    - The node ID with the minimum p.u. voltage
+
+    Args:
+        output_data: output of batch_powerflow
+        timestamps: timestamps of the batch
+
+    Returns:
+        voltage_table: DataFrame with voltage information.
+    """
+    node_data = output_data["node"]
+    voltage_data = node_data["u_pu"]
+
+    max_voltage = voltage_data.max(axis=1)
+    max_voltage_node = node_data["id"][np.arange(voltage_data.shape[0]), voltage_data.argmax(axis=1)]
+    min_voltage = voltage_data.min(axis=1)
+    min_voltage_node = node_data["id"][np.arange(voltage_data.shape[0]), voltage_data.argmin(axis=1)]
+
+    voltage_table = pd.DataFrame(
+        {
+            "Timestamp": timestamps,
+            "Max_Voltage": max_voltage,
+            "Max_Voltage_Node": max_voltage_node,
+            "Min_Voltage": min_voltage,
+            "Min_Voltage_Node": min_voltage_node,
+        }
+    )
+
+    voltage_table.set_index("Timestamp", inplace=True)
+
+    return voltage_table
+
+
+def loading_table_from_output(output_data: dict, timestamps: pd.Index) -> pd.DataFrame:
+    """
+    Aggregates batch power flow output into a table with line loading information.
+    The table contains the line ID as index and displays the following information per line:
+    - Energy loss of the line across the timeline in kWh
+    - Maximum loading in p.u. of the line across the whole timeline
+    - Timestamp of this maximum loading moment
+    - Minimum loading in p.u. of the line across the whole timeline
+    - Timestamp of this minimum loading moment
+
+    Args:
+        output_data: output of batch_powerflow
+        timestamps: timestamps of the batch
+
+    Returns:
+        loading_table: DataFrame with loading information.
+    """
+    loading = LoadingTableAccumulator()
+    loading.add(output_data)
+    return loading.table(timestamps)
+
+
+class LoadingTableAccumulator:
+    """
+    Folds consecutive chunks of batch power flow output into the loading table.
+    Keeps per line the running energy loss, the maximum and minimum loading with their first timestamp,
+    the last power loss row for the trapezoid across chunk boundaries, and the number of timestamps.
 
-        # Extract power data
-        p_from = pd.DataFrame(line_data["p_from"][:, :], columns=line_ids)
-        p_to = pd.DataFrame(line_data["p_to"][:, :], columns=line_ids)
+    The energy loss is summed strictly in timestamp order, so the result does not depend on the chunk size.
+    """
 
-        # Calculate power loss and energy loss
-        p_loss = (p_from + p_to) * 1e-3
-        e_loss = sp.integrate.trapezoid(p_loss, dx=1.0, axis=0)
+    def __init__(self) -> None:
+        self.line_ids = None
+        self.count = 0
+        self.total_loss = None
+        # (loading, timestamp position) per line
+        self.maximum = None
+        self.minimum = None
+        self.last_p_loss = None
 
-        # Compute maximum and minimum loading
-        loading = pd.DataFrame(line_data["loading"][:, :], columns=line_ids)
-        max_loading = loading.max()
-        min_loading = loading.min()
+    def add(self, output_data: dict) -> None:
+        """Folds the next chunk of timestamps into the running reductions.
 
-        max_loading_id = loading.idxmax()
-        min_loading_id = loading.idxmin()
+        Args:
+            output_data: output of batch_powerflow for the next chunk of timestamps
+        """
+        line_data = output_data["line"]
+        if line_data.shape[0] == 0:
+            return
+
+        # Calculate power loss, trapezoid intervals continue from the last row of the previous chunk
+        p_loss = (line_data["p_from"] + line_data["p_to"]) * 1e-3
+        if self.last_p_loss is not None:
+            p_loss = np.concatenate([self.last_p_loss, p_loss])
+        intervals = (p_loss[1:] + p_loss[:-1]) / 2.0
+
+        loading = line_data["loading"]
+        max_position = loading.argmax(axis=0)
+        min_position = loading.argmin(axis=0)
+        columns = np.arange(loading.shape[1])
+        max_loading = loading[max_position, columns]
+        min_loading = loading[min_position, columns]
+
+        if self.line_ids is None:
+            self.line_ids = line_data["id"][0, :]
+            self.total_loss = np.zeros(loading.shape[1])
+            self.maximum = (max_loading, max_position)
+            self.minimum = (min_loading, min_position)
+        else:
+            # strict comparison keeps the first timestamp of equal extremes
+            higher = max_loading > self.maximum[0]
+            self.maximum = (
+                np.where(higher, max_loading, self.maximum[0]),
+                np.where(higher, max_position + self.count, self.maximum[1]),
+            )
+            lower = min_loading < self.minimum[0]
+            self.minimum = (
+                np.where(lower, min_loading, self.minimum[0]),
+                np.where(lower, min_position + self.count, self.minimum[1]),
+            )
+
+        # cumsum adds the intervals one timestamp at a time, independent of the chunk boundaries
+        self.total_loss = np.cumsum(np.concatenate([self.total_loss[np.newaxis], intervals]), axis=0)[-1]
+        self.last_p_loss = p_loss[-1:]
+        self.count += loading.shape[0]
+
+    def table(self, timestamps: pd.Index) -> pd.DataFrame:
+        """Returns the loading table of all chunks added so far.
 
-        max_loading_time = active_power_profile.index[max_loading_id]
-        min_loading_time = active_power_profile.index[min_loading_id]
+        Args:
+            timestamps: timestamps of all chunks added so far
 
-        # Construct loading table
+        Returns:
+            loading_table: DataFrame with loading information.
+        """
         loading_table = pd.DataFrame(
             {
-                "Line_ID": line_ids,
-                "Total_Loss": e_loss,
-                "Max_Loading": max_loading.values,
-                "Max_Loading_Timestamp": max_loading_time.values,
-                "Min_Loading": min_loading.values,
-                "Min_Loading_Timestamp": min_loading_time.values,
+                "Line_ID": self.line_ids,
+                "Total_Loss": self.total_loss,
+                "Max_Loading": self.maximum[0],
+                "Max_Loading_Timestamp": timestamps[self.maximum[1]],
+                "Min_Loading": self.minimum[0],
+                "Min_Loading_Timestamp": timestamps[self.minimum[1]],
             }
         )
 
         loading_table.set_index("Line_ID", inplace=True)
 
         return loading_table
+
+
+class PowerFlowResultCache:
+    """
+    Content-addressed cache of batch power flow results, shared between PowerFlow objects.
+    Results are keyed by a hash of the grid, the update data, the calculation method and the output components.
+
+    The memory tier keeps the least recently used results within max_bytes.
+    With a directory, every result is also written there as one .npy file per component
+    and opened again memory-mapped, so results survive the process and evictions.
+    Cached arrays are read-only.
+
+    Statistics: hits (of which disk_hits), misses, evictions and nbytes in memory.
+    """
+
+    def __init__(self, max_bytes: int = 256 * 2**20, directory: str = None) -> None:
+        """
+        Args:
+            max_bytes: byte budget of the memory tier
+            directory: optional directory of the disk tier
+        """
+        self.max_bytes = max_bytes
+        self.directory = directory
+        self._counts = {"hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0, "nbytes": 0}
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+
+    def get(self, key: str):
+        """Returns the cached output data of key, or None.
+
+        Args:
+            key: content hash
+
+        Returns:
+            dict of read-only arrays, or None
+        """
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self._counts["hits"] += 1
+                return self._entries[key][0]
+
+        output_data = self._read(key)
+        with self._lock:
+            if output_data is None:
+                self._counts["misses"] += 1
+            else:
+                self._counts["hits"] += 1
+                self._counts["disk_hits"] += 1
+        return output_data
+
+    def put(self, key: str, output_data: dict) -> dict:
+        """Stores output data under key and returns it as cached, read-only arrays.
+
+        Args:
+            key: content hash
+            output_data: output of calculate_power_flow
+
+        Returns:
+            dict: the cached output data
+        """
+        for array in output_data.values():
+            array.flags.writeable = False
+        if self.directory is not None:
+            self._write(key, output_data)
+
+        nbytes = sum(array.nbytes for array in output_data.values())
+        with self._lock:
+            if key in self._entries or nbytes > self.max_bytes:
+                return output_data
+            while self._counts["nbytes"] + nbytes > self.max_bytes:
+                _, (_, evicted_nbytes) = self._entries.popitem(last=False)
+                self._counts["nbytes"] -= evicted_nbytes
+                self._counts["evictions"] += 1
+            self._entries[key] = (output_data, nbytes)
+            self._counts["nbytes"] += nbytes
+        return output_data
+
+    def stats(self) -> dict:
+        """Returns the cache statistics.
+
+        Returns:
+            dict: hits, disk_hits, misses, evictions, entries and nbytes
+        """
+        with self._lock:
+            return {**self._counts, "entries": len(self._entries)}
+
+    def _read(self, key: str):
+        if self.directory is None:
+            return None
+        path = os.path.join(self.directory, key)
+        if not os.path.isdir(path):
+            return None
+        return {
+            file_name[: -len(".npy")]: np.load(os.path.join(path, file_name), mmap_mode="r")
+            for file_name in sorted(os.listdir(path))
+        }
+
+    def _write(self, key: str, output_data: dict) -> None:
+        path = os.path.join(self.directory, key)
+        if os.path.isdir(path):
+            return
+        # write next to the final directory and rename, so readers never see a partial result
+        partial_path = tempfile.mkdtemp(prefix=f".{key}-", dir=self.directory)
+        for component, array in output_data.items():
+            np.save(os.path.join(partial_path, f"{component}.npy"), array)
+        try:
+            os.rename(partial_path, path)
+        except OSError:
+            # written concurrently by another process
+            for file_name in os.listdir(partial_path):
+                os.remove(os.path.join(partial_path, file_name))
+            os.rmdir(partial_path)
+
+
+# output components read by voltage_table_from_output and LoadingTableAccumulator
+TABLE_OUTPUT_COMPONENTS = frozenset({"node", "line"})
+
+
+def required_output_components(reductions: dict, output_component_types=None):
+    """Returns the output component types needed for the aggregate tables and the given reductions.
+
+    Args:
+        reductions: dict of name -> function(output_data, timestamps),
+            optionally with an `output_component_types` attribute
+        output_component_types: optional extra component types
+
+    Returns:
+        sorted list of component types, or None if a reduction needs the full output
+    """
+    components = set(TABLE_OUTPUT_COMPONENTS)
+    if output_component_types is not None:
+        components.update(output_component_types)
+    for reduction in reductions.values():
+        reduction_components = getattr(reduction, "output_component_types", None)
+        if reduction_components is None and output_component_types is None:
+            return None
+        components.update(reduction_components or ())
+    return sorted(components)
+
+
+def profile_values(profile) -> np.ndarray:
+    """Returns the (timestamps, loads) float64 values of a power profile, without a copy where possible.
+
+    Args:
+        profile: DataFrame with timestamps as index and load IDs as columns, or NumPy array
+
+    Returns:
+        np.ndarray: power values
+    """
+    if isinstance(profile, pd.DataFrame):
+        return profile.to_numpy(dtype=np.float64, copy=False)
+    return np.asarray(profile, dtype=np.float64)
+
+
+def profile_rows(profile, rows: slice):
+    """Returns a range of timestamps of a power profile.
+
+    Args:
+        profile: DataFrame with timestamps as index and load IDs as columns, or NumPy array
+        rows: slice of timestamp positions
+
+    Returns:
+        the same type as profile
+    """
+    if isinstance(profile, pd.DataFrame):
+        return profile.iloc[rows]
+    return profile[rows]
+
+
+def dataset_hash(*items) -> str:
+    """Returns a content hash of power_grid_model datasets and other plain arguments.
+    Arrays are hashed by dtype, shape and the raw bytes of every field, dicts by sorted key.
+
+    Args:
+        *items: arrays, dicts of arrays, or values with a stable repr
+
+    Returns:
+        str: hex digest
+    """
+    hasher = hashlib.blake2b(digest_size=16)
+    stack = list(reversed(items))
+    while stack:
+        item = stack.pop()
+        if isinstance(item, dict):
+            hasher.update(b"{")
+            stack.append("}")
+            for key in sorted(item, key=str, reverse=True):
+                stack.append(item[key])
+                stack.append(str(key))
+        elif isinstance(item, np.ndarray):
+            hasher.update(f"{item.dtype.descr}{item.shape}".encode())
+            # the padding of aligned structured dtypes is uninitialized, so only the fields are hashed
+            for name in item.dtype.names or (None,):
+                field = np.ascontiguousarray(item if name is None else item[name])
+                hasher.update(field.view(np.uint8).reshape(-1) if field.size else b"")
+        else:
+            hasher.update(repr(item).encode())
+    return hasher.hexdigest()
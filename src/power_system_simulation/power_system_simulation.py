@@ -1,5 +1,5 @@
 """
-`power_system_simulation.py` contains the class `PowerSim`. 
+`power_system_simulation.py` contains the class `PowerSim`.
 This class defines and validates a grid based on `power_flow_processing.PowerFlow`
 
 It is initialized with parameters:
@@ -9,18 +9,25 @@ It is initialized with parameters:
 `lv_feeders: list = None,`
 `active_power_profile: pd.DataFrame = None,`
 `reactive_power_profile: pd.DataFrame = None,`
+`validation=pfp.FullValidation,`
+`*,`
+`lazy: bool = False,`
+`cache: pfp.PowerFlowResultCache = None,`
 `) -> None`
 
 The object saves:
-`self.power_sim_model = pfp.PowerFlow(grid_data=grid_data)`
+`self.power_sim_model = pfp.PowerFlow(grid_data=grid_data, validation=validation, cache=cache)`
+`self.graph = graph_processing.GraphProcessor(...).freeze()`
 `self.grid_data`
 `self.lv_feeders`
 `self.active_power_profile`
 `self.reactive_power_profile`
 
+`power_sim_model` and `graph` are built on first use when `lazy=True`, or up front with `warmup()`.
+
 This data is used if no input is provided to the class functions.
 
-The class contains the functions: 
+The class contains the functions:
 1. `n1_calculations(`
    `self,`
    `grid_data: dict,`
@@ -37,28 +44,68 @@ The class contains the functions:
    `reactive_power_profile: pd.DataFrame,`
    `ev_active_power_profile: pd.DataFrame,`
    `) -> tuple`
-3. `optimal_tap_position(`
+3. `ev_penetration_monte_carlo(`
+   `self,`
+   `num_houses: int,`
+   `num_feeders: int,`
+   `penetration_level: float,`
+   `ev_active_power_profile: pd.DataFrame,`
+   `*,`
+   `monte_carlo: MonteCarloDraws = MonteCarloDraws(),`
+   `) -> dict`
+4. `optimal_tap_position(`
    `self,`
    `active_power_profile: pd.DataFrame = None,`
    `reactive_power_profile: pd.DataFrame = None,`
    `opt_criteria=TotalEnergyLoss,`
+   `search_strategy=ExhaustiveSearch,`
    `) -> int`
-4. `network_plotter(self, plot_criteria=graph_processing.EnabledEdges) -> None`
+5. `optimal_tap_schedule(`
+   `self,`
+   `active_power_profile: pd.DataFrame = None,`
+   `reactive_power_profile: pd.DataFrame = None,`
+   `opt_criteria=TotalEnergyLoss,`
+   `max_tap_changes_per_day: int = None,`
+   `) -> TapSchedule`
+6. `n1_sweep(`
+   `self,`
+   `active_power_profile: pd.DataFrame = None,`
+   `reactive_power_profile: pd.DataFrame = None,`
+   `*,`
+   `batch_size: int = 64,`
+   `max_workers: int = None,`
+   `progress=None,`
+   `screening_margin: float = None,`
+   `) -> pd.DataFrame`
+7. `graph_of(self, grid_data: dict) -> graph_processing.FrozenGraphProcessor`
+8. `warmup(self) -> None`
+9. `network_plotter(self, plot_criteria=graph_processing.EnabledEdges) -> None`
+
+The helper functions of the N-1 analysis are in `n1_analysis.py`,
+the search functions of the tap position optimizations in `tap_optimization.py`.
 """
 
 import math
 import random
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from enum import IntEnum
+from typing import NamedTuple
 
 import numpy as np
 import pandas as pd
+import scipy as sp
 
 try:
     import graph_processing as gp
+    import n1_analysis as n1a
     import power_flow_processing as pfp
+    import tap_optimization as topt
 except ImportError:
     import power_system_simulation.graph_processing as gp
+    import power_system_simulation.n1_analysis as n1a
     import power_system_simulation.power_flow_processing as pfp
+    import power_system_simulation.tap_optimization as topt
 
 
 # write exceptions here
@@ -134,6 +181,46 @@ class VoltageDeviation(IntEnum):
     """Criterium for optimization: Minimizes voltage deviation"""
 
 
+class ExhaustiveSearch(IntEnum):
+    """Tap search strategy: calculates every tap position in one batch"""
+
+
+class TernarySearch(IntEnum):
+    """Tap search strategy: ternary search over the tap positions, assuming a unimodal criterium"""
+
+
+class TapSchedule(NamedTuple):
+    """Optimal tap position per timestamp.
+
+    Args:
+        timestamps: timestamps of the power profiles
+        tap_positions: tap position per timestamp
+        criterion: optimization criterium per timestamp at the scheduled tap position
+        tap_changes: number of tap position changes in the schedule
+    """
+
+    timestamps: pd.Index
+    tap_positions: np.ndarray
+    criterion: np.ndarray
+    tap_changes: int
+
+
+class MonteCarloDraws(NamedTuple):
+    """Settings of `PowerSim.ev_penetration_monte_carlo`.
+
+    Args:
+        draws: number of random EV assignments
+        seed: seed of the random streams, anything accepted by np.random.SeedSequence
+        percentiles: percentiles of the distributions
+        draws_per_batch: number of draws per batch calculation, all draws if None
+    """
+
+    draws: int = 100
+    seed: int = None
+    percentiles: tuple = (5, 50, 95)
+    draws_per_batch: int = None
+
+
 class PowerSim:
     """
     In this class are the functionalities of assignment 3,
@@ -147,6 +234,10 @@ class PowerSim:
         lv_feeders: list = None,
         active_power_profile: pd.DataFrame = None,
         reactive_power_profile: pd.DataFrame = None,
+        validation=pfp.FullValidation,
+        *,
+        lazy: bool = False,
+        cache: pfp.PowerFlowResultCache = None,
     ) -> None:
         """
         Initialize the Power System Simulation model with grid data and optional profiles.
@@ -158,6 +249,12 @@ class PowerSim:
                 DataFrame containing active power profiles for houses/nodes
             reactive_power_profile (pd.DataFrame, optional):
                 DataFrame containing reactive power profiles for houses/nodes
+            validation (optional): pfp.FullValidation, pfp.ValidateOnce or pfp.NoValidation.
+                ValidateOnce skips repeated validation of identical data, e.g. across tap positions.
+            lazy (bool, optional): build `power_sim_model` and `graph` on first use instead of here.
+                Their errors, like GraphCycleError, are then raised on first use.
+            cache (pfp.PowerFlowResultCache, optional): result cache of `power_sim_model`, e.g. shared between
+                objects, so repeated batches like the tap positions of an optimization are calculated once.
 
         Raises:
             NotExactlyOneSourceError: Raised if the grid data does not contain exactly one source.
@@ -166,14 +263,17 @@ class PowerSim:
                 `lv_feeders` is not a valid line ID in `grid_data`.
             WrongFromNodeLVFeederError: Raised if the from_node of any
                 LV feeder line does not correspond to the to_node of the transformer in the grid.
-            CycleInGraphError: Raised if the power grid representation (graph) contains cycles.
+            GraphCycleError: Raised if the power grid representation (graph) contains cycles.
 
         Notes:
-            - Initializes a `PowerFlow` model (`power_sim_model`) using `grid_data`.
             - Checks the validity and consistency of the provided grid data and LV feeder configuration.
+            - Initializes a `PowerFlow` model (`power_sim_model`) using `grid_data`.
             - Sets up a `GraphProcessor` (`graph`) to handle graph operations on the power grid.
         """
-        self.power_sim_model = pfp.PowerFlow(grid_data=grid_data)
+        self.validation = validation
+        # lazily built components, the last graph of graph_of by its content hash and the result cache
+        self._components = {"power_sim_model": None, "graph": None, "graph_of": (None, None), "cache": cache}
+        self._lock = threading.RLock()
 
         self.grid_data = grid_data
         self.lv_feeders = lv_feeders
@@ -203,26 +303,56 @@ class PowerSim:
                         "The LV Feeder from_node does not correspond with the transformer to_node"
                     )
 
+        if not lazy:
+            self.warmup()
+
+    @property
+    def power_sim_model(self) -> pfp.PowerFlow:
+        """PowerFlow model of the grid, validated and built on first use."""
+        if self._components["power_sim_model"] is None:
+            with self._lock:
+                if self._components["power_sim_model"] is None:
+                    self._components["power_sim_model"] = pfp.PowerFlow(
+                        grid_data=self.grid_data, validation=self.validation, cache=self._components["cache"]
+                    )
+        return self._components["power_sim_model"]
+
+    @property
+    def graph(self) -> gp.FrozenGraphProcessor:
+        """Frozen graph of the grid, built on first use. Raises GraphCycleError or GraphNotFullyConnectedError."""
+        if self._components["graph"] is None:
+            with self._lock:
+                if self._components["graph"] is None:
+                    self._components["graph"] = self.graph_of(self.grid_data)
+        return self._components["graph"]
+
+    def warmup(self) -> None:
+        """Builds power_sim_model and graph now instead of on first use."""
+        _ = self.power_sim_model
         # Check if the graph does not contain cycles
-        edge_vertex_id_pairs = list(zip(grid_data["line"]["from_node"], grid_data["line"]["to_node"])) + list(
-            zip(grid_data["transformer"]["from_node"], grid_data["transformer"]["to_node"])
-        )
-        edge_enabled = []
-        for i in grid_data["line"]["id"]:
-            index = np.where(grid_data["line"]["id"] == i)
-            if grid_data["line"][index]["from_status"] == 1 & grid_data["line"][index]["to_status"] == 1:
-                edge_enabled = edge_enabled + [True]
-            else:
-                edge_enabled = edge_enabled + [False]
-        if grid_data["transformer"][0]["from_status"] == 1 & grid_data["transformer"][0]["to_status"] == 1:
-            edge_enabled = edge_enabled + [True]
-        else:
-            edge_enabled = edge_enabled + [False]
-        source_vertex_id = grid_data["source"]["node"][0]
-        edge_ids = list(grid_data["line"]["id"]) + list(grid_data["transformer"]["id"])
-        vertex_ids = grid_data["node"]["id"]
+        _ = self.graph
 
-        self.graph = gp.GraphProcessor(vertex_ids, edge_ids, edge_vertex_id_pairs, edge_enabled, source_vertex_id)
+    def graph_of(self, grid_data: dict) -> gp.FrozenGraphProcessor:
+        """
+        Returns the FrozenGraphProcessor of grid_data, built with `grid_graph_input`.
+        The last graph is cached by a content hash of the arrays it depends on,
+        so every method reuses it until the topology or the switching states change.
+        The graph is frozen, so switching it cannot make it differ from grid_data
+        and it can be shared between the threads of `n1_sweep`.
+
+        Args:
+            grid_data (dict): power grid input data
+
+        Returns:
+            gp.FrozenGraphProcessor: graph of the grid
+        """
+        key = pfp.dataset_hash({component: grid_data[component] for component in GRAPH_COMPONENTS})
+        with self._lock:
+            cached_key, graph = self._components["graph_of"]
+            if key != cached_key:
+                graph = gp.GraphProcessor(**grid_graph_input(grid_data)).freeze()
+                self._components["graph_of"] = (key, graph)
+        return graph
 
     def n1_calculations(
         self,
@@ -268,73 +398,142 @@ class PowerSim:
                 f"Line ID {disabled_edge_id} is not connected at both ends in the base grid configuration."
             )
 
-        # Rewriting the grid dataframe to assignment 1 list:
+        # Find alternative edges
+        graph = self.graph_of(grid_data)
+        alt_edges = graph.find_alternative_edges(disabled_edge_id)
 
-        edge_vertex_id_pairs = list(zip(grid_data["line"]["from_node"], grid_data["line"]["to_node"])) + list(
-            zip(grid_data["transformer"]["from_node"], grid_data["transformer"]["to_node"])
+        # Every alternative line is one scenario: the disabled line opened, the alternative line closed
+        alt_line_ids = np.array(
+            [alt_edge for alt_edge in alt_edges if alt_edge in line_data["id"]], dtype=line_data["id"].dtype
         )
-        edge_enabled = []
-        for i in grid_data["line"]["id"]:
-            index = np.where(grid_data["line"]["id"] == i)
-            if grid_data["line"][index]["from_status"] == 1 & grid_data["line"][index]["to_status"] == 1:
-                edge_enabled = edge_enabled + [True]
-            else:
-                edge_enabled = edge_enabled + [False]
-        if grid_data["transformer"][0]["from_status"] == 1 & grid_data["transformer"][0]["to_status"] == 1:
-            edge_enabled = edge_enabled + [True]
-        else:
-            edge_enabled = edge_enabled + [False]
-        source_vertex_id = grid_data["source"]["node"][0]
-        edge_ids = list(grid_data["line"]["id"]) + list(grid_data["transformer"]["id"])
-        vertex_ids = grid_data["node"]["id"]
+        if len(alt_line_ids) == 0:
+            return pd.DataFrame(
+                columns=["Alternative_Line_ID", "Max_Loading", "Max_Loading_ID", "Max_Loading_Timestamp"]
+            )
 
-        # Find alternative edges
+        line_status = n1a.n1_line_status(np.full(len(alt_line_ids), disabled_edge_id), alt_line_ids)
 
-        graph = gp.GraphProcessor(
-            vertex_ids=vertex_ids,
-            edge_ids=edge_ids,
-            edge_vertex_id_pairs=edge_vertex_id_pairs,
-            edge_enabled=edge_enabled,
-            source_vertex_id=source_vertex_id,
-        )
+        loading_data = self.power_sim_model.scenario_sweep(
+            active_power_profile, reactive_power_profile, {"line": line_status}, output_component_types=["line"]
+        )["line"]
+        timestamps = self.power_sim_model.profile_axes(active_power_profile)[0]
 
-        alt_edges = graph.find_alternative_edges(disabled_edge_id)
+        results_df = n1a.n1_loading_table(alt_line_ids, loading_data, timestamps)
 
-        # Run Powerflow table and aggregate table
+        return results_df
 
-        results = []
+    def n1_sweep(
+        self,
+        active_power_profile: pd.DataFrame = None,
+        reactive_power_profile: pd.DataFrame = None,
+        *,
+        batch_size: int = 64,
+        max_workers: int = None,
+        progress=None,
+        screening_margin: float = None,
+    ) -> pd.DataFrame:
+        """
+        Runs the N-1 calculation for every enabled line of the grid and ranks the contingencies.
 
-        for alt_line_id in alt_edges:
-            alt_line_index = None
-            for i in range(len(line_data["id"])):
-                if line_data["id"][i] == alt_line_id:
-                    alt_line_index = i
-                    break
-            if alt_line_index is not None:
-                line_data["to_status"][alt_line_index] = 1
-                loading_table = self.power_sim_model.aggregate_loading_table(
-                    active_power_profile=active_power_profile, reactive_power_profile=reactive_power_profile
-                )
-
-                max_loading = loading_table["Max_Loading"].max()
-                max_loading_id = loading_table["Max_Loading"].idxmax()
-                max_loading_timestamp = loading_table.loc[max_loading_id, "Max_Loading_Timestamp"]
-
-                results.append(
-                    {
-                        "Alternative_Line_ID": alt_line_id,
-                        "Max_Loading": max_loading,
-                        "Max_Loading_ID": max_loading_id,
-                        "Max_Loading_Timestamp": max_loading_timestamp,
-                    }
-                )
-        results_df = pd.DataFrame(results)
-        if results_df.empty:
-            results_df = pd.DataFrame(
-                columns=["Alternative_Line_ID", "Max_Loading", "Max_Loading_ID", "Max_Loading_Timestamp"]
-            )
+        The alternatives of all lines are found at once with `find_all_alternative_edges`.
+        Every (disabled line, alternative line) pair is a scenario; the scenarios are calculated in batches
+        of batch_size scenarios x timestamps by a thread pool, each thread with its own copy of the model.
+        The pool is the only level of parallelism: every batch is calculated sequentially by power-grid-model
+        (threads=-1), so max_workers threads do not each start a thread per hardware thread.
 
-        return results_df
+        Per contingency, the alternative with the lowest maximum loading is kept: the loading once supply is
+        restored the best possible way. The table is sorted by that loading, highest first. Contingencies
+        without an alternative line have no loading and are listed last.
+
+        With screening_margin, all scenarios are first screened with the linear power flow method, which
+        estimates the loadings without iterating. Only scenarios with an estimated maximum loading within
+        screening_margin of the 1.0 p.u. limit are calculated again with Newton-Raphson; the others keep
+        their estimate and are marked in the Screened column.
+
+        If the sweep is interrupted, the pending batches are cancelled and the exception is raised again,
+        with the scenario results of the finished batches in its `n1_sweep_results` attribute;
+        `n1_analysis.n1_contingency_table(error.n1_sweep_results, contingency_ids)` then ranks the partial results.
+        Every call keeps its own results, so sweeps can run concurrently on one object.
+
+        Args:
+            active_power_profile (pd.DataFrame, optional): Active power profile for houses/nodes.
+            reactive_power_profile (pd.DataFrame, optional): Reactive power profile for houses/nodes.
+            batch_size (int, optional): number of scenarios per power flow batch.
+            max_workers (int, optional): number of threads, defaults to the ThreadPoolExecutor default.
+            progress (optional): function(finished_scenarios, total_scenarios), called after every batch.
+                With screening, the Newton-Raphson scenarios are added to the total after the screening.
+            screening_margin (float, optional): loading margin in p.u. below 1.0 for the full calculation,
+                e.g. 0.2 recalculates scenarios with an estimated loading of 0.8 p.u. and more.
+
+        Returns:
+            pd.DataFrame: one row per enabled line with the disabled line ID, the best alternative line ID,
+                the number of alternatives, the maximum loading, the line ID of this maximum, its timestamp
+                and whether the loading is a screening estimate.
+        """
+        if active_power_profile is None:
+            active_power_profile = self.active_power_profile
+
+        if reactive_power_profile is None:
+            reactive_power_profile = self.reactive_power_profile
+
+        contingency_ids, disabled_ids, alternative_ids = n1a.n1_scenarios(
+            self.graph_of(self.grid_data), self.grid_data["line"]["id"]
+        )
+
+        timestamps = self.power_sim_model.profile_axes(active_power_profile)[0]
+        # validate the profiles once before they are sent to the workers
+        self.power_sim_model.load_update(active_power_profile, reactive_power_profile)
+
+        def run_batch(scenarios, calculation_method):
+            line_status = n1a.n1_line_status(disabled_ids[scenarios], alternative_ids[scenarios])
+            loading_data = self.power_sim_model.copy().scenario_sweep(
+                active_power_profile,
+                reactive_power_profile,
+                {"line": line_status},
+                output_component_types=["line"],
+                calculation_method=calculation_method,
+                threads=-1,
+            )["line"]
+            table = n1a.n1_loading_table(alternative_ids[scenarios], loading_data, timestamps)
+            table.insert(0, "Disabled_Line_ID", disabled_ids[scenarios])
+            table["Screened"] = calculation_method != pfp.CalculationMethod.newton_raphson
+            table.index = pd.Index(scenarios)
+            return table
+
+        def run_all(scenarios, calculation_method, total):
+            finished = total - len(scenarios)
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                pending = {
+                    executor.submit(run_batch, scenarios[start : start + batch_size], calculation_method)
+                    for start in range(0, len(scenarios), batch_size)
+                }
+                try:
+                    while pending:
+                        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            table = future.result()
+                            results.append(table)
+                            finished += len(table)
+                            if progress is not None:
+                                progress(finished, total)
+                except BaseException as error:
+                    for future in pending:
+                        future.cancel()
+                    error.n1_sweep_results = results
+                    raise
+
+        results = []
+        scenarios = np.arange(len(disabled_ids))
+        if screening_margin is None:
+            run_all(scenarios, pfp.CalculationMethod.newton_raphson, len(scenarios))
+        else:
+            run_all(scenarios, pfp.CalculationMethod.linear, len(scenarios))
+            screened = pd.concat(results) if results else None
+            if screened is not None:
+                candidates = np.sort(screened.index[screened["Max_Loading"] >= 1.0 - screening_margin].to_numpy())
+                run_all(candidates, pfp.CalculationMethod.newton_raphson, len(scenarios) + len(candidates))
+
+        return n1a.n1_contingency_table(results, contingency_ids)
 
     def ev_penetration(
         self,
@@ -366,28 +565,8 @@ class PowerSim:
 
         grid_data = self.grid_data  # Assuming grid_data is an attribute of self
 
-        # Initialize the GraphProcessor to find downstream vertices
-        edge_vertex_id_pairs = list(zip(grid_data["line"]["from_node"], grid_data["line"]["to_node"])) + list(
-            zip(grid_data["transformer"]["from_node"], grid_data["transformer"]["to_node"])
-        )
-        edge_enabled = [
-            (f_status == 1 and t_status == 1)
-            for f_status, t_status in zip(grid_data["line"]["from_status"], grid_data["line"]["to_status"])
-        ]
-        edge_enabled += [
-            (grid_data["transformer"]["from_status"][0] == 1 and grid_data["transformer"]["to_status"][0] == 1)
-        ]
-        source_vertex_id = grid_data["source"]["node"][0]
-        edge_ids = list(grid_data["line"]["id"]) + list(grid_data["transformer"]["id"])
-        vertex_ids = grid_data["node"]["id"]
-
-        test4 = gp.GraphProcessor(
-            vertex_ids=vertex_ids,
-            edge_ids=edge_ids,
-            edge_vertex_id_pairs=edge_vertex_id_pairs,
-            edge_enabled=edge_enabled,
-            source_vertex_id=source_vertex_id,
-        )
+        # GraphProcessor to find downstream vertices
+        test4 = self.graph_of(grid_data)
 
         transformer_to_node = grid_data["transformer"]["to_node"][0]
 
@@ -416,20 +595,121 @@ class PowerSim:
 
         # Run time-series power flow after assigning EV profiles
         self.grid_data = grid_data  # Update grid data with new sym_load values if needed
-        voltage_table = self.power_sim_model.aggregate_voltage_table(active_power_profile, reactive_power_profile)
-        loading_table = self.power_sim_model.aggregate_loading_table(active_power_profile, reactive_power_profile)
+        tables = self.power_sim_model.aggregate_tables(active_power_profile, reactive_power_profile)
+
+        return tables["voltage_table"], tables["loading_table"]
 
-        return voltage_table, loading_table
+    def ev_penetration_monte_carlo(
+        self,
+        num_houses: int,
+        num_feeders: int,
+        penetration_level: float,
+        ev_active_power_profile: pd.DataFrame,
+        *,
+        monte_carlo: MonteCarloDraws = MonteCarloDraws(),
+    ) -> dict:
+        """
+        Repeats the random EV assignment of `ev_penetration` for a number of draws and summarizes the spread
+        of the maximum line loading and the minimum node voltage, using the power profiles of this object.
+        Every draw has an independent random stream spawned from the seed, so results are reproducible and do not
+        depend on `draws_per_batch`. All draws and timestamps are stacked into one batch calculation,
+        or into chunks of `draws_per_batch` draws. The EV profiles are added to the loads of the selected houses;
+        the power profiles themselves are not changed.
+
+        Args:
+            num_houses (int): Number of houses in the grid.
+            num_feeders (int): Number of feeders in the grid.
+            penetration_level (float): Percentage of houses with EV charging.
+            ev_active_power_profile (pd.DataFrame): EV charging profiles with the timestamps of the power profiles.
+            monte_carlo (MonteCarloDraws, optional): Number of draws, seed, percentiles and draws per batch.
+
+        Returns:
+            dict:
+                "max_loading": maximum line loading per draw
+                "min_voltage": minimum node voltage per draw
+                "percentiles": pd.DataFrame with the percentiles of "Max_Loading" and "Min_Voltage"
+                "line_percentiles": pd.DataFrame with the percentiles of the maximum loading per line
+
+        Raises:
+            ValueError: If draws or draws_per_batch is not positive.
+            TimestampMismatch: If the EV profiles do not have the timestamps of the power profiles.
+            NotEnoughEVprofilesForHouseAssignment: If there are fewer EV profiles than EVs.
+        """
+        draws = monte_carlo.draws
+        draws_per_batch = draws if monte_carlo.draws_per_batch is None else monte_carlo.draws_per_batch
+        if draws < 1 or draws_per_batch < 1:
+            raise ValueError("draws and draws_per_batch must be positive.")
+
+        grid_data = self.power_sim_model.grid_data
+        load_update = self.power_sim_model.load_update(self.active_power_profile, self.reactive_power_profile)
+        load_update = load_update["sym_load"]
+        timestamps, _ = self.power_sim_model.profile_axes(self.active_power_profile)
+        if not timestamps.equals(self.power_sim_model.profile_axes(ev_active_power_profile)[0]):
+            raise pfp.TimestampMismatch("Timestamps of EV and active power profiles do not match.")
+
+        load_nodes = grid_data["sym_load"]["node"][
+            pd.Index(grid_data["sym_load"]["id"]).get_indexer(load_update["id"][0])
+        ]
+        feeder_loads = ev_feeder_loads(self.graph_of(grid_data), grid_data, load_nodes)
+        evs_per_feeder = math.floor(math.floor(penetration_level * num_houses / 100) / num_feeders)
+
+        ev_values = pfp.profile_values(ev_active_power_profile)
+        if sum(min(evs_per_feeder, len(loads)) for loads in feeder_loads) > ev_values.shape[1]:
+            raise NotEnoughEVprofilesForHouseAssignment("Not enough EV profiles to assign to all houses.")
+
+        streams = [np.random.default_rng(stream) for stream in np.random.SeedSequence(monte_carlo.seed).spawn(draws)]
+        line_ids = grid_data["line"]["id"]
+        line_max_loading = np.empty((draws, len(line_ids)))
+        min_voltage = np.empty(draws)
+
+        for start in range(0, draws, draws_per_batch):
+            batch_streams = streams[start : start + draws_per_batch]
+            output_data = self.power_sim_model.calculate_batch(
+                ev_draws_update(load_update, ev_values, batch_streams, feeder_loads, evs_per_feeder),
+                output_component_types=["node", "line"],
+            )
+            shape = (len(batch_streams), len(timestamps), -1)
+            line_max_loading[start : start + len(batch_streams)] = (
+                output_data["line"]["loading"].reshape(shape).max(axis=1)
+            )
+            min_voltage[start : start + len(batch_streams)] = (
+                output_data["node"]["u_pu"].reshape(shape).min(axis=(1, 2))
+            )
+
+        max_loading = line_max_loading.max(axis=1)
+        percentiles = monte_carlo.percentiles
+        index = pd.Index(percentiles, name="Percentile")
+        return {
+            "max_loading": max_loading,
+            "min_voltage": min_voltage,
+            "percentiles": pd.DataFrame(
+                {
+                    "Max_Loading": np.percentile(max_loading, percentiles),
+                    "Min_Voltage": np.percentile(min_voltage, percentiles),
+                },
+                index=index,
+            ),
+            "line_percentiles": pd.DataFrame(
+                np.percentile(line_max_loading, percentiles, axis=0).T,
+                index=pd.Index(line_ids, name="Line_ID"),
+                columns=index,
+            ),
+        }
 
     def optimal_tap_position(
         self,
         active_power_profile: pd.DataFrame = None,
         reactive_power_profile: pd.DataFrame = None,
         opt_criteria=TotalEnergyLoss,
+        search_strategy=ExhaustiveSearch,
     ) -> int:
         """
         Determines the optimal tap position of a transformer based on specified optimization criteria.
         Calculates either the tap position that minimizes total energy loss or minimizes voltage deviation.
+        With ExhaustiveSearch, all timestamps and tap positions are calculated together in one batch.
+        With TernarySearch, only O(log(tap range)) tap positions are calculated, assuming the criterium is unimodal
+        in the tap position; the final candidates and their neighbours are checked exhaustively.
+        Calculated batches go through the result cache passed to PowerSim, if any.
 
         Args:
             active_power_profile (pd.DataFrame, optional): Active power profile for houses/nodes.
@@ -437,6 +717,7 @@ class PowerSim:
             opt_criteria (object, optional): Criteria for optimization:
                 - TotalEnergyLoss: Minimizes total energy loss (default).
                 - VoltageDeviation: Minimizes voltage deviation.
+            search_strategy (object, optional): ExhaustiveSearch (default) or TernarySearch.
 
         Returns:
             int: Optimal tap position of the transformer.
@@ -451,51 +732,88 @@ class PowerSim:
         if reactive_power_profile is None:
             reactive_power_profile = self.reactive_power_profile
 
-        grid_data = self.power_sim_model.grid_data
+        tap_positions = topt.tap_range(self.power_sim_model.grid_data["transformer"])
+
+        if opt_criteria not in (TotalEnergyLoss, VoltageDeviation):
+            raise ValueError("opt_criteria must be TotalEnergyLoss or VoltageDeviation")
+
+        def evaluate(positions):
+            return tap_criterion(
+                self.power_sim_model,
+                active_power_profile,
+                reactive_power_profile,
+                tap_positions[positions],
+                opt_criteria,
+            )
+
+        if search_strategy == ExhaustiveSearch:
+            criterion = evaluate(np.arange(len(tap_positions)))
+            return int(tap_positions[np.argmin(criterion)])
 
-        update_tap = range(grid_data["transformer"]["tap_max"][0], grid_data["transformer"]["tap_min"][0] + 1)
+        if search_strategy != TernarySearch:
+            raise ValueError("search_strategy must be ExhaustiveSearch or TernarySearch")
 
-        energy_loss_aggregate = {}
-        voltage_deviation = {}
-        voltage_table = {}
+        optimal_position = topt.ternary_search(evaluate, len(tap_positions))
+        optimal_tap = int(tap_positions[optimal_position])
 
-        # output_data = {}
+        return optimal_tap
 
-        for i in update_tap:
-            # output_data[f"tap{i}"] = self.power_sim_model.batch_powerflow(
-            #     active_power_profile=active_power_profile, reactive_power_profile=reactive_power_profile, tap_value=i
-            # )
+    def optimal_tap_schedule(
+        self,
+        active_power_profile: pd.DataFrame = None,
+        reactive_power_profile: pd.DataFrame = None,
+        opt_criteria=TotalEnergyLoss,
+        max_tap_changes_per_day: int = None,
+    ) -> TapSchedule:
+        """
+        Determines the optimal tap position of the transformer for every timestamp, for on-load tap changers.
+        All timestamps and tap positions are calculated together in one batch. The criterium per timestamp is
+        the total line power loss in kW (TotalEnergyLoss) or the voltage deviation of VoltageDeviation.
 
-            if opt_criteria == TotalEnergyLoss:
-                energy_loss_aggregate[f"{i}"] = sum(
-                    (
-                        self.power_sim_model.aggregate_loading_table(
-                            active_power_profile=active_power_profile,
-                            reactive_power_profile=reactive_power_profile,
-                            tap_value=i,
-                        )
-                    )["Total_Loss"]
-                )
+        Without a limit, every timestamp gets the tap position with the lowest criterium.
+        With max_tap_changes_per_day, the schedule with the lowest summed criterium that changes the
+        tap position at most that many times per calendar day is found by dynamic programming.
+        Profiles without a DatetimeIndex are treated as one day.
 
-            elif opt_criteria == VoltageDeviation:
-                voltage_table[f"{i}"] = self.power_sim_model.aggregate_voltage_table(
-                    active_power_profile=active_power_profile, reactive_power_profile=reactive_power_profile
-                )
-                voltage_deviation[f"{i}"] = sum(
-                    (pd.DataFrame(voltage_table[f"{i}"][["Max_Voltage", "Min_Voltage"]] - 1).max(axis=1)).tolist()
-                ) / len((pd.DataFrame(voltage_table[f"{i}"][["Max_Voltage", "Min_Voltage"]] - 1).max(axis=1)).tolist())
+        Args:
+            active_power_profile (pd.DataFrame, optional): Active power profile for houses/nodes.
+            reactive_power_profile (pd.DataFrame, optional): Reactive power profile for houses/nodes.
+            opt_criteria (object, optional): TotalEnergyLoss (default) or VoltageDeviation.
+            max_tap_changes_per_day (int, optional): limit of tap position changes per day.
 
-        optimal_tap = 0
+        Returns:
+            TapSchedule: tap position and criterium per timestamp as arrays.
+        """
+        if active_power_profile is None:
+            active_power_profile = self.active_power_profile
 
-        if opt_criteria == TotalEnergyLoss:
-            optimal_tap = int(min(energy_loss_aggregate, key=lambda k: energy_loss_aggregate[k]))
+        if reactive_power_profile is None:
+            reactive_power_profile = self.reactive_power_profile
 
-        elif opt_criteria == VoltageDeviation:
-            # print(pd.DataFrame(voltage_deviation.keys()))
-            optimal_tap = int(min(voltage_deviation, key=lambda k: voltage_deviation[k]))
-            # print(optimal_tap)
+        if opt_criteria not in (TotalEnergyLoss, VoltageDeviation):
+            raise ValueError("opt_criteria must be TotalEnergyLoss or VoltageDeviation")
 
-        return optimal_tap
+        tap_positions = topt.tap_range(self.power_sim_model.grid_data["transformer"])
+        cost = tap_cost_matrix(
+            self.power_sim_model, active_power_profile, reactive_power_profile, tap_positions, opt_criteria
+        )
+        timestamps = self.power_sim_model.profile_axes(active_power_profile)[0]
+
+        if max_tap_changes_per_day is None:
+            schedule = cost.argmin(axis=1)
+        else:
+            if isinstance(timestamps, pd.DatetimeIndex):
+                days = pd.factorize(timestamps.normalize())[0]
+            else:
+                days = np.zeros(len(timestamps), dtype=np.int64)
+            schedule = topt.limited_change_schedule(cost, days, max_tap_changes_per_day)
+
+        return TapSchedule(
+            timestamps=timestamps,
+            tap_positions=tap_positions[schedule],
+            criterion=cost[np.arange(len(schedule)), schedule],
+            tap_changes=int(np.count_nonzero(np.diff(schedule))),
+        )
 
     def network_plotter(self, plot_criteria=gp.EnabledEdges) -> None:
         """Plots object network.
@@ -504,36 +822,156 @@ class PowerSim:
             plot_criteria: _description_. Defaults to graph_processing.EnabledEdges.
             Possible to use graph_processing.AllEdges.
         """
-        # Rewriting the grid dataframe to assignment 1 list:
-        grid_data = self.grid_data
+        graph = self.graph_of(self.grid_data)
 
-        edge_vertex_id_pairs = list(zip(grid_data["line"]["from_node"], grid_data["line"]["to_node"])) + list(
-            zip(grid_data["transformer"]["from_node"], grid_data["transformer"]["to_node"])
-        )
-        edge_enabled = []
-        for i in grid_data["line"]["id"]:
-            index = np.where(grid_data["line"]["id"] == i)
-            if grid_data["line"][index]["from_status"] == 1 & grid_data["line"][index]["to_status"] == 1:
-                edge_enabled = edge_enabled + [True]
-            else:
-                edge_enabled = edge_enabled + [False]
-        if grid_data["transformer"][0]["from_status"] == 1 & grid_data["transformer"][0]["to_status"] == 1:
-            edge_enabled = edge_enabled + [True]
-        else:
-            edge_enabled = edge_enabled + [False]
-        source_vertex_id = grid_data["source"]["node"][0]
-        edge_ids = list(grid_data["line"]["id"]) + list(grid_data["transformer"]["id"])
-        vertex_ids = grid_data["node"]["id"]
+        # plot network
+        graph.graph_plotter(plot_criteria=plot_criteria)
 
-        # Find alternative edges
 
-        graph = gp.GraphProcessor(
-            vertex_ids=vertex_ids,
-            edge_ids=edge_ids,
-            edge_vertex_id_pairs=edge_vertex_id_pairs,
-            edge_enabled=edge_enabled,
-            source_vertex_id=source_vertex_id,
-        )
+# other functions not dependent on specific class
+def tap_criterion(
+    power_flow: pfp.PowerFlow,
+    active_power_profile: pd.DataFrame,
+    reactive_power_profile: pd.DataFrame,
+    tap_positions,
+    opt_criteria,
+) -> np.ndarray:
+    """Calculates the optimization criterium for a set of tap positions in one batch.
 
-        # plot network
-        graph.graph_plotter(plot_criteria=plot_criteria)
+    Args:
+        power_flow: PowerFlow model of the grid
+        active_power_profile: Active power profile for houses/nodes
+        reactive_power_profile: Reactive power profile for houses/nodes
+        tap_positions: tap positions to calculate
+        opt_criteria: TotalEnergyLoss or VoltageDeviation
+
+    Returns:
+        np.ndarray: criterium per tap position, lower is better
+    """
+    if opt_criteria == TotalEnergyLoss:
+        line_data = power_flow.tap_sweep(
+            active_power_profile, reactive_power_profile, tap_positions, output_component_types=["line"]
+        )["line"]
+        p_loss = (line_data["p_from"] + line_data["p_to"]) * 1e-3
+        return sp.integrate.trapezoid(p_loss, dx=1.0, axis=1).sum(axis=1)
+
+    voltage = power_flow.tap_sweep(
+        active_power_profile, reactive_power_profile, tap_positions, output_component_types=["node"]
+    )["node"]["u_pu"]
+    return np.maximum(voltage.max(axis=2) - 1, voltage.min(axis=2) - 1).mean(axis=1)
+
+
+def ev_feeder_loads(graph: gp.GraphProcessor, grid_data: dict, load_nodes: np.ndarray) -> list:
+    """Finds the houses of every LV feeder, the lines leaving the transformer like in `ev_penetration`.
+
+    Args:
+        graph: graph of grid_data
+        grid_data: power_grid_model input data
+        load_nodes: node of every load, in the order of the power profiles
+
+    Returns:
+        list: load positions in the power profiles per feeder
+    """
+    transformer_to_node = grid_data["transformer"]["to_node"][0]
+    feeders = grid_data["line"]["id"][grid_data["line"]["from_node"] == transformer_to_node]
+    return [np.flatnonzero(np.isin(load_nodes, graph.find_downstream_vertices(feeder))) for feeder in feeders]
+
+
+def ev_assignment(rng: np.random.Generator, feeder_loads: list, evs_per_feeder: int, profile_count: int) -> tuple:
+    """Draws the houses with an EV on every feeder and a distinct EV profile for each of them.
+    Feeders with fewer houses than `evs_per_feeder` get an EV in every house.
+
+    Args:
+        rng: random stream of this draw
+        feeder_loads: load positions per feeder, from `ev_feeder_loads`
+        evs_per_feeder: number of EVs per feeder
+        profile_count: number of EV profiles
+
+    Returns:
+        tuple: load positions and EV profile positions, pairwise
+    """
+    loads = [rng.choice(feeder, min(evs_per_feeder, len(feeder)), replace=False) for feeder in feeder_loads]
+    loads = np.concatenate(loads) if loads else np.empty(0, dtype=np.int64)
+    return loads, rng.choice(profile_count, len(loads), replace=False)
+
+
+def ev_draws_update(
+    load_update: np.ndarray, ev_values: np.ndarray, streams: list, feeder_loads: list, evs_per_feeder: int
+) -> dict:
+    """Stacks the sym_load update of every draw, with the EV profiles of its random assignment added.
+
+    Args:
+        load_update: sym_load update of shape (timestamps, loads)
+        ev_values: EV profiles of shape (timestamps, profiles)
+        streams: random stream per draw
+        feeder_loads: load positions per feeder, from `ev_feeder_loads`
+        evs_per_feeder: number of EVs per feeder
+
+    Returns:
+        dict: update data with the "sym_load" array of shape (draws * timestamps, loads)
+    """
+    timestamps = len(load_update)
+    update = np.tile(load_update, (len(streams), 1))
+    for draw, rng in enumerate(streams):
+        loads, ev_profiles = ev_assignment(rng, feeder_loads, evs_per_feeder, ev_values.shape[1])
+        update["p_specified"][draw * timestamps : (draw + 1) * timestamps, loads] += ev_values[:, ev_profiles]
+    return {"sym_load": update}
+
+
+# components of grid_data that make up the graph
+GRAPH_COMPONENTS = ("node", "line", "transformer", "source")
+
+
+def grid_graph_input(grid_data: dict) -> dict:
+    """Converts grid_data to the arguments of GraphProcessor with whole-array operations.
+    The edges are the lines followed by the transformers, an edge is enabled if both its ends are connected.
+
+    Args:
+        grid_data: power grid input data
+
+    Returns:
+        dict: vertex_ids, edge_ids, edge_vertex_id_pairs, edge_enabled and source_vertex_id
+    """
+    branches = (grid_data["line"], grid_data["transformer"])
+    return {
+        "vertex_ids": grid_data["node"]["id"],
+        "edge_ids": np.concatenate([branch["id"] for branch in branches]),
+        "edge_vertex_id_pairs": np.concatenate(
+            [np.column_stack([branch["from_node"], branch["to_node"]]) for branch in branches]
+        ),
+        "edge_enabled": np.concatenate(
+            [(branch["from_status"] == 1) & (branch["to_status"] == 1) for branch in branches]
+        ),
+        "source_vertex_id": grid_data["source"]["node"][0],
+    }
+
+
+def tap_cost_matrix(
+    power_flow: pfp.PowerFlow,
+    active_power_profile: pd.DataFrame,
+    reactive_power_profile: pd.DataFrame,
+    tap_positions,
+    opt_criteria,
+) -> np.ndarray:
+    """Calculates the optimization criterium per timestamp and tap position in one batch.
+
+    Args:
+        power_flow: PowerFlow model of the grid
+        active_power_profile: Active power profile for houses/nodes
+        reactive_power_profile: Reactive power profile for houses/nodes
+        tap_positions: tap positions to calculate
+        opt_criteria: TotalEnergyLoss (line power loss in kW) or VoltageDeviation
+
+    Returns:
+        np.ndarray: criterium of shape (timestamps, tap positions), lower is better
+    """
+    if opt_criteria == TotalEnergyLoss:
+        line_data = power_flow.tap_sweep(
+            active_power_profile, reactive_power_profile, tap_positions, output_component_types=["line"]
+        )["line"]
+        return ((line_data["p_from"] + line_data["p_to"]) * 1e-3).sum(axis=2).T
+
+    voltage = power_flow.tap_sweep(
+        active_power_profile, reactive_power_profile, tap_positions, output_component_types=["node"]
+    )["node"]["u_pu"]
+    return np.maximum(voltage.max(axis=2) - 1, voltage.min(axis=2) - 1).T
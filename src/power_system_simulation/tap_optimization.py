@@ -0,0 +1,127 @@
+"""
+`tap_optimization.py` contains the search functions of the tap position optimizations of `PowerSim`.
+
+The module contains:
+1. `tap_range(transformer: np.ndarray) -> np.ndarray`
+2. `ternary_search(evaluate, size: int) -> int`
+3. `limited_change_schedule(cost: np.ndarray, days: np.ndarray, max_changes: int) -> np.ndarray`
+"""
+
+import numpy as np
+
+
+def tap_range(transformer: np.ndarray) -> np.ndarray:
+    """Returns the tap positions of the transformer from tap_max towards tap_min.
+    Optimizations break ties in this order, so they go to the tap position closest to tap_max.
+
+    Args:
+        transformer: transformer input array with one transformer
+
+    Returns:
+        np.ndarray: tap positions
+    """
+    tap_max = int(transformer["tap_max"][0])
+    tap_min = int(transformer["tap_min"][0])
+    step = 1 if tap_min >= tap_max else -1
+    return np.arange(tap_max, tap_min + step, step)
+
+
+def ternary_search(evaluate, size: int) -> int:
+    """Finds the position of the minimum of a unimodal function over the integers 0 .. size - 1.
+    The two probes of every step are evaluated together and every position is evaluated at most once.
+    The remaining candidates and their neighbours are checked exhaustively, ties go to the lowest position.
+
+    Args:
+        evaluate: function of an array of positions, returning an array of values
+        size: number of positions
+
+    Returns:
+        int: position of the minimum
+    """
+    values = {}
+
+    def value_of(positions):
+        missing = [position for position in positions if position not in values]
+        if missing:
+            values.update(zip(missing, evaluate(np.array(missing))))
+        return [values[position] for position in positions]
+
+    low, high = 0, size - 1
+    while high - low > 3:
+        third = (high - low) // 3
+        left, right = low + third, high - third
+        left_value, right_value = value_of([left, right])
+        if left_value <= right_value:
+            high = right
+        else:
+            low = left + 1
+
+    candidates = list(range(max(low - 1, 0), min(high + 1, size - 1) + 1))
+    candidate_values = value_of(candidates)
+    return candidates[int(np.argmin(candidate_values))]
+
+
+def limited_change_schedule(cost: np.ndarray, days: np.ndarray, max_changes: int) -> np.ndarray:
+    """Finds the schedule with the lowest summed cost that changes state at most max_changes times per day.
+
+    Dynamic programming over (number of changes today, state) per timestamp. A change at the first timestamp
+    of a day counts for that day. On ties, staying is preferred over changing and lower states over higher.
+
+    Args:
+        cost: cost of shape (timestamps, states)
+        days: day number per timestamp, non-decreasing
+        max_changes: maximum number of state changes per day
+
+    Returns:
+        np.ndarray: state index per timestamp
+    """
+    n_timestamps, n_states = cost.shape
+    if n_timestamps == 0:
+        return np.zeros(0, dtype=np.int64)
+    if max_changes < 0:
+        raise ValueError("max_changes must not be negative")
+
+    states = np.arange(n_states)
+    counts = np.arange(max_changes + 1)[:, np.newaxis]
+    # best[c, k]: lowest cost up to this timestamp, ending in state k after c changes today
+    best = np.full((max_changes + 1, n_states), np.inf)
+    best[0] = cost[0]
+    previous_state = np.zeros((n_timestamps, max_changes + 1, n_states), dtype=np.int64)
+    previous_count = np.zeros((n_timestamps, max_changes + 1, n_states), dtype=np.int64)
+
+    for timestamp in range(1, n_timestamps):
+        count_of = np.broadcast_to(counts, best.shape)
+        if days[timestamp] != days[timestamp - 1]:
+            # a new day starts with no changes, from the best count of yesterday per state
+            count_of = np.zeros_like(best, dtype=np.int64)
+            count_of[0] = best.argmin(axis=0)
+            collapsed = np.full_like(best, np.inf)
+            collapsed[0] = best.min(axis=0)
+            best = collapsed
+
+        # cheapest state to change from, per count, excluding the state itself via the second cheapest
+        order = np.argsort(best, axis=1, kind="stable")
+        first, second = order[:, 0], order[:, min(1, n_states - 1)]
+        change_from = np.where(states == first[:, np.newaxis], second[:, np.newaxis], first[:, np.newaxis])
+        change_cost = np.take_along_axis(best, change_from, axis=1)
+        if n_states == 1:
+            change_cost = np.full_like(change_cost, np.inf)
+
+        # a change moves from count c - 1 to count c
+        change_cost = np.vstack([np.full((1, n_states), np.inf), change_cost[:-1]])
+        change_from = np.vstack([np.zeros((1, n_states), dtype=np.int64), change_from[:-1]])
+        change_count = np.take_along_axis(
+            np.vstack([np.zeros((1, n_states), dtype=np.int64), count_of[:-1]]), change_from, axis=1
+        )
+
+        stay = best <= change_cost
+        previous_state[timestamp] = np.where(stay, states, change_from)
+        previous_count[timestamp] = np.where(stay, count_of, change_count)
+        best = np.where(stay, best, change_cost) + cost[timestamp]
+
+    count, state = divmod(int(np.argmin(best)), n_states)
+    schedule = np.empty(n_timestamps, dtype=np.int64)
+    for timestamp in range(n_timestamps - 1, -1, -1):
+        schedule[timestamp] = state
+        state, count = previous_state[timestamp, count, state], previous_count[timestamp, count, state]
+    return schedule
@@ -1,5 +1,9 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
 import pytest  # Import pytest
 
+import power_system_simulation.graph_index as gi
 import power_system_simulation.graph_processing as tp  # Import power_system_simpulation.graphy_processing
 
 
@@ -80,3 +84,249 @@ def test_graph_plotter():
 
     void_test = test4.graph_plotter(plot_criteria=tp.EnabledEdges)  # Testcase 2 of graph_plotter
     assert void_test == None
+
+
+def test_downstream_vertices_disabled_and_unknown_edge():
+    vertex_ids = [0, 2, 4]  # All unique vertex ids
+    edge_ids = [1, 3, 5]  # All unique edge ids
+    edge_vertex_id_pairs = [(0, 2), (2, 4), (4, 0)]  # Egde 1, egde 3 and edge 5
+    edge_enabled = [True, True, False]  # Whether each edge is enabled or disabled
+    source_vertex_id = 0  # ID of the source vertex
+
+    test5 = tp.GraphProcessor(
+        vertex_ids=vertex_ids,
+        edge_ids=edge_ids,
+        edge_vertex_id_pairs=edge_vertex_id_pairs,
+        edge_enabled=edge_enabled,
+        source_vertex_id=source_vertex_id,
+    )
+
+    downstream_vertices = test5.find_downstream_vertices(5)  # Testcase 1: disabled edge
+    assert downstream_vertices == []
+
+    with pytest.raises(tp.IDNotFoundError):  # Testcase 2: unknown edge
+        test5.find_downstream_vertices(7)
+
+    with pytest.raises(tp.IDNotFoundError):  # Testcase 3: unknown edge
+        test5.find_alternative_edges(7)
+
+    with pytest.raises(tp.EdgeAlreadyDisabledError):  # Testcase 4: disabled edge
+        test5.find_alternative_edges(5)
+
+
+def test_deep_radial_feeder():
+    # a feeder much deeper than the Python recursion limit
+    n_vertices = 20000
+    vertex_ids = list(range(n_vertices))
+    edge_ids = list(range(n_vertices, 2 * n_vertices - 1))
+    edge_vertex_id_pairs = [(i, i + 1) for i in range(n_vertices - 1)]
+    edge_enabled = [True] * (n_vertices - 1)
+
+    test6 = tp.GraphProcessor(
+        vertex_ids=vertex_ids,
+        edge_ids=edge_ids,
+        edge_vertex_id_pairs=edge_vertex_id_pairs,
+        edge_enabled=edge_enabled,
+        source_vertex_id=0,
+    )
+
+    assert test6.find_downstream_vertices(edge_ids[0]) == vertex_ids[1:]
+    assert test6.find_downstream_vertices(edge_ids[-1]) == [n_vertices - 1]
+
+    traversal = test6.dfs(0, test6._state.edge_enabled)
+    assert traversal.depth[-1] == n_vertices - 1
+    assert traversal.subtree_end[n_vertices // 2] == n_vertices
+
+
+def test_downstream_vertices_tree_cache():
+    vertex_ids = [0, 2, 4, 6, 10]  # All unique vertex ids
+    edge_ids = [1, 3, 5, 7, 8, 9]  # All unique edge ids
+    edge_vertex_id_pairs = [(0, 2), (0, 4), (0, 6), (2, 4), (4, 6), (2, 10)]
+    edge_enabled = [True, True, True, False, False, True]  # Whether each edge is enabled or disabled
+
+    test7 = tp.GraphProcessor(
+        vertex_ids=vertex_ids,
+        edge_ids=edge_ids,
+        edge_vertex_id_pairs=edge_vertex_id_pairs,
+        edge_enabled=edge_enabled,
+        source_vertex_id=0,
+    )
+
+    tree = test7._rooted_tree()
+    assert test7._rooted_tree() is tree  # the tree index is built once
+    assert test7.find_downstream_vertices(1) == [2, 10]
+    assert test7._rooted_tree() is tree
+    assert test7.edge_enabled == edge_enabled  # queries do not touch the input
+
+
+def test_all_alternative_edges():
+    vertex_ids = [0, 2, 4, 6, 10]  # All unique vertex ids
+    edge_ids = [1, 3, 5, 7, 8, 9]  # All unique edge ids
+    edge_vertex_id_pairs = [(0, 2), (0, 4), (0, 6), (2, 4), (4, 6), (2, 10)]
+    edge_enabled = [True, True, True, False, False, True]  # Whether each edge is enabled or disabled
+
+    test8 = tp.GraphProcessor(
+        vertex_ids=vertex_ids,
+        edge_ids=edge_ids,
+        edge_vertex_id_pairs=edge_vertex_id_pairs,
+        edge_enabled=edge_enabled,
+        source_vertex_id=0,
+    )
+
+    alternatives = test8.find_all_alternative_edges()
+    assert alternatives.shape == (6, 6)
+    for i, edge_id in enumerate(edge_ids):
+        alternative_edges = [
+            edge_ids[j] for j in alternatives.indices[alternatives.indptr[i] : alternatives.indptr[i + 1]]
+        ]
+        if edge_enabled[i]:
+            assert alternative_edges == test8.find_alternative_edges(edge_id)
+        else:
+            assert alternative_edges == []
+
+
+def test_enable_disable_edge():
+    vertex_ids = [0, 2, 4, 6, 10]  # All unique vertex ids
+    edge_ids = [1, 3, 5, 7, 8, 9]  # All unique edge ids
+    edge_vertex_id_pairs = [(0, 2), (0, 4), (0, 6), (2, 4), (4, 6), (2, 10)]
+    edge_enabled = [True, True, True, False, False, True]  # Whether each edge is enabled or disabled
+
+    test9 = tp.GraphProcessor(
+        vertex_ids=vertex_ids,
+        edge_ids=edge_ids,
+        edge_vertex_id_pairs=edge_vertex_id_pairs,
+        edge_enabled=edge_enabled,
+        source_vertex_id=0,
+    )
+
+    test9.disable_edge(1, 7)  # Testcase 1: vertex 2 and 10 are now fed through vertex 4
+    assert test9.edge_enabled == [False, True, True, True, False, True]
+    assert test9.find_downstream_vertices(3) == [4, 2, 10]
+    assert test9.find_alternative_edges(3) == [1, 8]
+
+    test9.enable_edge(1, 7)  # Testcase 2: switch back to the original topology
+    assert test9.edge_enabled == edge_enabled
+    assert test9.find_downstream_vertices(1) == [2, 10]
+    assert test9.find_alternative_edges(3) == [7, 8]
+
+    with pytest.raises(tp.GraphNotFullyConnectedError):  # Testcase 3: disabling without alternative
+        test9.disable_edge(9, None)
+    with pytest.raises(tp.GraphNotFullyConnectedError):  # Testcase 4: edge 8 does not reconnect vertex 10
+        test9.disable_edge(9, 8)
+    with pytest.raises(tp.GraphCycleError):  # Testcase 5: enabling without disabling
+        test9.enable_edge(8, None)
+    with pytest.raises(tp.GraphCycleError):  # Testcase 6: edge 9 is not part of the cycle of edge 8
+        test9.enable_edge(8, 9)
+    with pytest.raises(tp.EdgeAlreadyEnabledError):
+        test9.enable_edge(1, 3)
+    with pytest.raises(tp.EdgeAlreadyEnabledError):
+        test9.disable_edge(1, 3)
+    with pytest.raises(tp.EdgeAlreadyDisabledError):
+        test9.disable_edge(7, 8)
+    with pytest.raises(tp.EdgeAlreadyDisabledError):
+        test9.enable_edge(7, 8)
+    assert test9.edge_enabled == edge_enabled  # failed switching actions do not change the graph
+
+
+def test_frozen_graph_processor():
+    vertex_ids = [0, 2, 4, 6, 10]  # All unique vertex ids
+    edge_ids = [1, 3, 5, 7, 8, 9]  # All unique edge ids
+    edge_vertex_id_pairs = [(0, 2), (0, 4), (0, 6), (2, 4), (4, 6), (2, 10)]
+    edge_enabled = [True, True, True, False, False, True]  # Whether each edge is enabled or disabled
+
+    graph = tp.GraphProcessor(vertex_ids, edge_ids, edge_vertex_id_pairs, edge_enabled, 0)
+    snapshot = graph.freeze()
+    graph.disable_edge(1, 7)  # switching the original graph does not change the snapshot
+
+    test10 = tp.FrozenGraphProcessor(vertex_ids, edge_ids, edge_vertex_id_pairs, edge_enabled, 0)
+    expected_alternatives = {1: [7], 3: [7, 8], 5: [8], 9: []}
+    expected_downstream = {1: [2, 10], 3: [4], 5: [6], 9: [10]}
+
+    def query(edge_id):
+        return snapshot.find_alternative_edges(edge_id), test10.find_downstream_vertices(edge_id)
+
+    # many threads share the frozen graphs without copies or locks
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        results = list(executor.map(query, [1, 3, 5, 9] * 50))
+    for edge_id, (alternative_edges, downstream_vertices) in zip([1, 3, 5, 9] * 50, results):
+        assert alternative_edges == expected_alternatives[edge_id]
+        assert downstream_vertices == expected_downstream[edge_id]
+
+    with pytest.raises(tp.GraphIsFrozenError):
+        test10.disable_edge(1, 7)
+    with pytest.raises(tp.GraphIsFrozenError):
+        snapshot.enable_edge(7, 1)
+    with pytest.raises(ValueError):  # the indexes are read-only
+        test10._state.edge_enabled[0] = False
+    assert snapshot.edge_enabled == tuple(edge_enabled)
+
+
+def test_save_and_load(tmp_path):
+    vertex_ids = [0, 2, 4, 6, 10]  # All unique vertex ids
+    edge_ids = [1, 3, 5, 7, 8, 9]  # All unique edge ids
+    edge_vertex_id_pairs = [(0, 2), (0, 4), (0, 6), (2, 4), (4, 6), (2, 10)]
+    edge_enabled = [True, True, True, False, False, True]  # Whether each edge is enabled or disabled
+
+    graph = tp.GraphProcessor(vertex_ids, edge_ids, edge_vertex_id_pairs, edge_enabled, 0)
+    graph.save(tmp_path / "graph.bin")
+
+    test11 = tp.FrozenGraphProcessor.load(tmp_path / "graph.bin")
+    assert test11.source_vertex_id == 0
+    assert test11.vertex_ids.tolist() == vertex_ids
+    assert test11.edge_vertex_id_pairs.tolist() == [list(pair) for pair in edge_vertex_id_pairs]
+    for edge_id in [1, 3, 5, 9]:
+        assert test11.find_downstream_vertices(edge_id) == graph.find_downstream_vertices(edge_id)
+        assert test11.find_alternative_edges(edge_id) == graph.find_alternative_edges(edge_id)
+    assert (test11.find_all_alternative_edges() != graph.find_all_alternative_edges()).nnz == 0
+    with pytest.raises(tp.GraphIsFrozenError):
+        test11.disable_edge(1, 7)
+
+    # a graph without edges
+    tp.GraphProcessor([0], [], [], [], 0).save(tmp_path / "single.bin")
+    assert tp.FrozenGraphProcessor.load(tmp_path / "single.bin").find_all_alternative_edges().nnz == 0
+
+    (tmp_path / "invalid.bin").write_bytes(b"not a graph")
+    with pytest.raises(gi.InvalidGraphFileError):
+        tp.FrozenGraphProcessor.load(tmp_path / "invalid.bin")
+
+    data = bytearray((tmp_path / "graph.bin").read_bytes())
+    data[len(gi.GRAPH_FILE_MAGIC)] = gi.GRAPH_FILE_VERSION + 1
+    (tmp_path / "future.bin").write_bytes(bytes(data))
+    with pytest.raises(gi.InvalidGraphFileError):
+        tp.FrozenGraphProcessor.load(tmp_path / "future.bin")
+
+
+def test_switching_matches_full_traversal():
+    # a random tree with extra disabled edges, switched many times
+    rng = np.random.default_rng(7)
+    n_vertices = 200
+    edge_vertex_id_pairs = [(int(rng.integers(vertex)), vertex) for vertex in range(1, n_vertices)]
+    tree_pairs = set(edge_vertex_id_pairs)
+    while len(edge_vertex_id_pairs) < n_vertices + 40:
+        pair = tuple(sorted(rng.choice(n_vertices, 2, replace=False).tolist()))
+        if pair not in tree_pairs:
+            tree_pairs.add(pair)
+            edge_vertex_id_pairs.append(pair)
+    edge_ids = list(range(100, 100 + len(edge_vertex_id_pairs)))
+    edge_enabled = [True] * (n_vertices - 1) + [False] * (len(edge_ids) - n_vertices + 1)
+
+    graph = tp.GraphProcessor(list(range(n_vertices)), edge_ids, edge_vertex_id_pairs, edge_enabled, 0)
+    snapshots = []
+    for step in range(100):
+        edge_id = edge_ids[int(rng.choice(np.flatnonzero(~np.array(graph.edge_enabled))))]
+        cycle = [
+            edge
+            for edge in edge_ids
+            if graph.edge_enabled[edge - 100] and edge_id in graph.find_alternative_edges(edge)
+        ]
+        graph.enable_edge(edge_id, int(rng.choice(cycle)))
+        if step % 10 == 0:
+            snapshots.append((graph.freeze(), edge_id, graph.find_downstream_vertices(edge_id)))
+
+        expected = graph.dfs(graph._topology.source, graph._state.edge_enabled)
+        for name in gi.Traversal._fields:
+            assert np.array_equal(getattr(graph._state.tree, name), getattr(expected, name)), name
+
+    # switching after a snapshot does not change the snapshot
+    for snapshot, edge_id, downstream_vertices in snapshots:
+        assert snapshot.find_downstream_vertices(edge_id) == downstream_vertices
@@ -178,3 +178,29 @@ def test_cycle_error():
             5,
         )
     assert str(excinfo.value) == "Cycle found"
+
+
+def test_all_offending_edges_and_components_reported():
+    # tests that every cycle closing edge is reported, not just the first one
+    with pytest.raises(GraphCycleError) as excinfo:
+        GraphProcessor(
+            [1, 2, 3, 4, 5, 6, 7, 8],
+            [1, 2, 3, 4, 5, 6, 7, 8, 9],
+            [(1, 2), (2, 3), (3, 4), (2, 5), (5, 6), (5, 7), (7, 8), (6, 3), (1, 7)],
+            [True, True, True, True, True, True, True, True, True],
+            1,
+        )
+    assert str(excinfo.value) == "Cycle found"
+    assert excinfo.value.edge_ids == [8, 9]
+
+    # tests that every unreachable component is reported
+    with pytest.raises(GraphNotFullyConnectedError) as excinfo:
+        GraphProcessor(
+            [1, 2, 3, 4, 5, 6, 7],
+            [1, 2, 3, 4, 5],
+            [(1, 2), (3, 4), (6, 7), (4, 5), (2, 6)],
+            [True, True, True, True, False],
+            1,
+        )
+    assert str(excinfo.value) == "Graph not fully connected. Cannot reach all vertices."
+    assert excinfo.value.components == [[3, 4, 5], [6, 7]]
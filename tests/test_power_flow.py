@@ -1,6 +1,9 @@
+import operator
+import tempfile
 import unittest
 from datetime import datetime
 
+import numpy as np
 import pandas as pd
 import scipy as sp
 from power_grid_model.utils import json_deserialize_from_file
@@ -101,6 +104,210 @@ class TestPowerFlow(unittest.TestCase):
         with self.assertRaises(pfp.LoadIDMismatch):
             self.pf.batch_powerflow(self.active_power_profile, reactive_power_profile)
 
+    def test_numpy_power_profiles(self):
+        load_order = self.active_power_profile.columns.get_indexer(self.grid_data["sym_load"]["id"])
+        active = self.active_power_profile.to_numpy()[:, load_order]
+        reactive = self.reactive_power_profile.to_numpy()[:, load_order]
+
+        loading_table = self.pf.aggregate_loading_table(active, reactive)
+        expected = self.pf.aggregate_loading_table(self.active_power_profile, self.reactive_power_profile)
+        pd.testing.assert_frame_equal(
+            loading_table.drop(columns=["Max_Loading_Timestamp", "Min_Loading_Timestamp"]),
+            expected.drop(columns=["Max_Loading_Timestamp", "Min_Loading_Timestamp"]),
+        )
+        self.assertListEqual(
+            list(self.active_power_profile.index[loading_table["Max_Loading_Timestamp"]]),
+            list(expected["Max_Loading_Timestamp"]),
+        )
+
+        with self.assertRaises(pfp.LoadIDMismatch):
+            self.pf.batch_powerflow(active[:, :-1], reactive[:, :-1])
+
+    def test_sequential_batch(self):
+        update = self.pf.load_update(self.active_power_profile, self.reactive_power_profile)
+        expected = self.pf.calculate_batch(update, output_component_types=["line"])
+        sequential = self.pf.calculate_batch(update, output_component_types=["line"], threads=-1)
+        np.testing.assert_allclose(sequential["line"]["loading"], expected["line"]["loading"])
+
+    def test_validation_modes(self):
+        expected = self.pf.aggregate_loading_table(self.active_power_profile, self.reactive_power_profile)
+        self.assertGreater(self.pf.validation_time, 0.0)
+        self.assertGreater(self.pf.calculation_time, 0.0)
+
+        for mode in (pfp.ValidateOnce, pfp.NoValidation):
+            pf = pfp.PowerFlow(grid_data=self.grid_data, validation=mode)
+            table = pf.aggregate_loading_table(self.active_power_profile, self.reactive_power_profile)
+            pd.testing.assert_frame_equal(table, expected)
+
+        # identical data is validated once per process
+        pf = pfp.PowerFlow(grid_data=self.grid_data, validation=pfp.ValidateOnce)
+        pf.batch_powerflow(self.active_power_profile, self.reactive_power_profile)
+        key = pfp.dataset_hash(
+            "assert_valid_input_data",
+            {"input_data": self.grid_data, "symmetric": True, "calculation_type": pfp.CalculationType.power_flow},
+        )
+        self.assertIn(key, pfp._validated_datasets)
+        self.assertNotEqual(key, pfp.dataset_hash("assert_valid_input_data", {"input_data": {}}))
+
+        pf = pfp.PowerFlow(grid_data=self.grid_data, validation=pfp.NoValidation)
+        pf.batch_powerflow(self.active_power_profile, self.reactive_power_profile)
+        self.assertEqual(pf.validation_time, 0.0)
+
+        with self.assertRaises(pfp.InvalidValidationModeError):
+            pfp.PowerFlow(grid_data=self.grid_data, validation="sometimes")
+
+    def test_validate_once_equal_datasets(self):
+        pf = pfp.PowerFlow(grid_data=self.grid_data, validation=pfp.ValidateOnce)
+        update = pf.load_update(self.active_power_profile, self.reactive_power_profile)
+        pf.calculate_batch(update)
+        validated = len(pfp._validated_datasets)
+
+        # an equal grid loaded separately and an equal update in a new allocation with other padding bytes
+        grid_data = json_deserialize_from_file("src/power_system_simulation/input_network_data.json")
+        padded = np.full(update["sym_load"].nbytes, 255, dtype=np.uint8).view(update["sym_load"].dtype)
+        padded = padded.reshape(update["sym_load"].shape)
+        for name in padded.dtype.names:
+            padded[name] = update["sym_load"][name]
+
+        pf = pfp.PowerFlow(grid_data=grid_data, validation=pfp.ValidateOnce)
+        pf.calculate_batch({"sym_load": padded})
+        self.assertEqual(len(pfp._validated_datasets), validated)
+
+    def test_aggregate_tables(self):
+        def max_node_voltage(output_data, timestamps):
+            return output_data["node"]["u_pu"].max()
+
+        tables = self.pf.aggregate_tables(
+            self.active_power_profile,
+            self.reactive_power_profile,
+            reductions={"max_node_voltage": max_node_voltage},
+        )
+        pd.testing.assert_frame_equal(tables["voltage_table"], self.expected_output_table_row_per_timestamp)
+        pd.testing.assert_frame_equal(tables["loading_table"], self.expected_output_table_row_per_line)
+        self.assertListEqual(tables["max_node_voltage"], [tables["voltage_table"]["Max_Voltage"].max()])
+
+        # with a combine step the result does not depend on the chunk size
+        max_node_voltage.combine = max
+        for chunk_size in (None, 7):
+            tables = self.pf.aggregate_tables(
+                self.active_power_profile,
+                self.reactive_power_profile,
+                reductions={"max_node_voltage": max_node_voltage},
+                chunk_size=chunk_size,
+            )
+            self.assertEqual(tables["max_node_voltage"], tables["voltage_table"]["Max_Voltage"].max())
+
+    def test_chunked_aggregate_tables(self):
+        def rows(output_data, timestamps):
+            return len(timestamps)
+
+        def total_rows(output_data, timestamps):
+            return len(timestamps)
+
+        total_rows.combine = operator.add
+
+        tables = self.pf.aggregate_tables(self.active_power_profile, self.reactive_power_profile)
+        for chunk_size in (1, 3, 10):
+            chunked = self.pf.aggregate_tables(
+                self.active_power_profile,
+                self.reactive_power_profile,
+                reductions={"rows": rows, "total_rows": total_rows},
+                chunk_size=chunk_size,
+            )
+            pd.testing.assert_frame_equal(chunked["voltage_table"], tables["voltage_table"], check_exact=True)
+            pd.testing.assert_frame_equal(chunked["loading_table"], tables["loading_table"], check_exact=True)
+            self.assertEqual(len(chunked["rows"]), -(-len(self.active_power_profile) // chunk_size))
+            self.assertEqual(sum(chunked["rows"]), len(self.active_power_profile))
+            self.assertEqual(chunked["total_rows"], len(self.active_power_profile))
+
+        with self.assertRaises(ValueError):
+            self.pf.aggregate_tables(self.active_power_profile, self.reactive_power_profile, chunk_size=0)
+
+    def test_output_component_types(self):
+        output_data = self.pf.batch_powerflow(
+            self.active_power_profile, self.reactive_power_profile, output_component_types=["line"]
+        )
+        self.assertListEqual(list(output_data), ["line"])
+
+        def source_power(output_data, timestamps):
+            return output_data["source"]["p"].sum()
+
+        self.assertListEqual(pfp.required_output_components({}), ["line", "node"])
+        self.assertIsNone(pfp.required_output_components({"source_power": source_power}))
+        source_power.output_component_types = ["source"]
+        source_power.combine = operator.add
+        self.assertListEqual(pfp.required_output_components({"source_power": source_power}), ["line", "node", "source"])
+
+        tables = self.pf.aggregate_tables(
+            self.active_power_profile, self.reactive_power_profile, reductions={"source_power": source_power}
+        )
+        pd.testing.assert_frame_equal(tables["loading_table"], self.expected_output_table_row_per_line)
+        self.assertGreater(tables["source_power"], 0.0)
+
+    def test_result_cache(self):
+        with tempfile.TemporaryDirectory() as directory:
+            cache = pfp.PowerFlowResultCache(directory=directory)
+            pf = pfp.PowerFlow(grid_data=self.grid_data, cache=cache)
+            first = pf.aggregate_tables(self.active_power_profile, self.reactive_power_profile)
+            second = pf.aggregate_tables(self.active_power_profile, self.reactive_power_profile)
+            pf.aggregate_tables(self.active_power_profile * 1.1, self.reactive_power_profile)
+            self.assertEqual(cache.stats()["hits"], 1)
+            self.assertEqual(cache.stats()["misses"], 2)
+            pd.testing.assert_frame_equal(first["loading_table"], second["loading_table"])
+
+            # a new process finds the results on disk
+            cache = pfp.PowerFlowResultCache(directory=directory)
+            pf = pfp.PowerFlow(grid_data=self.grid_data, cache=cache)
+            third = pf.aggregate_tables(self.active_power_profile, self.reactive_power_profile)
+            pd.testing.assert_frame_equal(first["voltage_table"], third["voltage_table"])
+            self.assertEqual(cache.stats()["disk_hits"], 1)
+
+            output_data = pf.batch_powerflow(self.active_power_profile, self.reactive_power_profile)
+            self.assertFalse(output_data["node"].flags.writeable)
+
+            # the memory budget only holds one result
+            cache = pfp.PowerFlowResultCache(max_bytes=output_data["node"].nbytes)
+            cache.put("a", {"node": output_data["node"].copy()})
+            cache.put("b", {"node": output_data["node"].copy()})
+            self.assertEqual(cache.stats()["evictions"], 1)
+            self.assertIsNone(cache.get("a"))
+            self.assertIsNotNone(cache.get("b"))
+
+    def test_cache_assigned_later(self):
+        # two grids sharing a cache that is assigned after construction
+        grid_data = json_deserialize_from_file("src/power_system_simulation/input_network_data.json")
+        grid_data["line"]["r1"] *= 3
+        first = pfp.PowerFlow(grid_data=self.grid_data)
+        second = pfp.PowerFlow(grid_data=grid_data)
+        first.cache = second.cache = pfp.PowerFlowResultCache()
+
+        first_table = first.aggregate_loading_table(self.active_power_profile, self.reactive_power_profile)
+        second_table = second.aggregate_loading_table(self.active_power_profile, self.reactive_power_profile)
+        self.assertEqual(first.cache.stats()["hits"], 0)
+        self.assertFalse(first_table.equals(second_table))
+        pd.testing.assert_frame_equal(
+            second_table,
+            pfp.PowerFlow(grid_data=grid_data).aggregate_loading_table(
+                self.active_power_profile, self.reactive_power_profile
+            ),
+        )
+
+    def test_cache_key_ignores_padding(self):
+        cache = pfp.PowerFlowResultCache()
+        grid_data = json_deserialize_from_file("src/power_system_simulation/input_network_data.json")
+        self.assertEqual(
+            pfp.PowerFlow(grid_data=self.grid_data, cache=cache)._grid_hash,
+            pfp.PowerFlow(grid_data=grid_data, cache=cache)._grid_hash,
+        )
+
+        # equal records with different bytes in the padding of the aligned dtype
+        update = self.pf.load_update(self.active_power_profile, self.reactive_power_profile)["sym_load"]
+        self.assertGreater(update.dtype.itemsize, sum(update.dtype[name].itemsize for name in update.dtype.names))
+        padded = np.full(update.nbytes, 255, dtype=np.uint8).view(update.dtype).reshape(update.shape)
+        for name in update.dtype.names:
+            padded[name] = update[name]
+        self.assertEqual(pfp.dataset_hash({"sym_load": update}), pfp.dataset_hash({"sym_load": padded}))
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -1,4 +1,5 @@
 import unittest
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
 import numpy as np
@@ -9,8 +10,10 @@ from power_grid_model import LoadGenType, PowerGridModel, initialize_array
 from power_grid_model.utils import json_deserialize_from_file
 
 import power_system_simulation.graph_processing as gp
+import power_system_simulation.n1_analysis as n1a
 import power_system_simulation.power_flow_processing as pfp
 import power_system_simulation.power_system_simulation as pss
+import power_system_simulation.tap_optimization as topt
 from power_system_simulation.graph_processing import GraphCycleError, GraphNotFullyConnectedError
 
 # from power_system_simulation.input_data_validity_check import InvalidLVFeederIDError, validity_check, NotExactlyOneSourceError, NotExactlyOneTransformerError, WrongFromNodeLVFeederError  # Import power_system_simpulation.graphy_processing
@@ -69,6 +72,48 @@ class TestPowerSim(unittest.TestCase):
         void_test = self.psm.network_plotter(plot_criteria=gp.EnabledEdges)  # Testcase 2 of find network_plotter
         assert void_test == None
 
+    def test_graph_of(self):
+        graph_input = pss.grid_graph_input(self.grid_data)
+        line = self.grid_data["line"]
+        expected_enabled = [bool(f == 1 and t == 1) for f, t in zip(line["from_status"], line["to_status"])] + [True]
+        self.assertListEqual(list(graph_input["edge_enabled"]), expected_enabled)
+        self.assertListEqual(
+            list(graph_input["edge_ids"]), list(line["id"]) + list(self.grid_data["transformer"]["id"])
+        )
+        self.assertEqual(graph_input["edge_vertex_id_pairs"].shape, (len(line) + 1, 2))
+
+        # the graph is built once and rebuilt when the switching states change
+        self.assertIs(self.psm.graph_of(self.grid_data), self.psm.graph)
+        switched = {component: array.copy() for component, array in self.grid_data.items()}
+        switched["line"]["to_status"][switched["line"]["id"] == 24] = 1
+        switched["line"]["to_status"][switched["line"]["id"] == 16] = 0
+        graph = self.psm.graph_of(switched)
+        self.assertIsNot(graph, self.psm.graph)
+        self.assertListEqual(list(graph.find_alternative_edges(24)), [16])
+
+        # the shared graph cannot be switched away from grid_data
+        with self.assertRaises(gp.GraphIsFrozenError):
+            self.psm.graph.disable_edge(16, 24)
+        self.assertEqual(self.psm.graph_of(self.grid_data).edge_enabled, self.psm.graph.edge_enabled)
+
+    def test_lazy_components(self):
+        psm = pss.PowerSim(grid_data=self.grid_data, lazy=True)
+        self.assertIsNone(psm._components["power_sim_model"])
+        self.assertIsNone(psm._components["graph"])
+
+        # the graph is built without the power flow model
+        self.assertListEqual(psm.graph.find_downstream_vertices(24), [])
+        self.assertIsNone(psm._components["power_sim_model"])
+
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            models = list(executor.map(lambda _: psm.power_sim_model, range(8)))
+        self.assertTrue(all(model is models[0] for model in models))
+
+        psm = pss.PowerSim(grid_data=self.grid_data, lazy=True)
+        psm.warmup()
+        self.assertIsNotNone(psm._components["power_sim_model"])
+        self.assertIsNotNone(psm._components["graph"])
+
     def test_N1(self):
         disabled_edge_id = 16
         table = self.psm.n1_calculations(
@@ -84,7 +129,7 @@ class TestPowerSim(unittest.TestCase):
         expected_output = pd.DataFrame(
             {
                 "Alternative_Line_ID": [24],
-                "Max_Loading": [0.0016589657345386518],
+                "Max_Loading": [0.0016596056544885465],
                 "Max_Loading_ID": [21],
                 "Max_Loading_Timestamp": [pd.Timestamp("2025-01-07 10:30:00")],
             }
@@ -96,6 +141,77 @@ class TestPowerSim(unittest.TestCase):
         # Compare with expected output
         pd.testing.assert_frame_equal(table, expected_output)
 
+    def test_N1_does_not_mutate_inputs(self):
+        line_data = self.grid_data["line"].copy()
+        active_power_profile = self.active_power_profile.copy()
+        self.psm.n1_calculations(self.grid_data, self.active_power_profile, self.reactive_power_profile, 16)
+        np.testing.assert_array_equal(self.grid_data["line"]["to_status"], line_data["to_status"])
+        np.testing.assert_array_equal(self.grid_data["line"]["from_status"], line_data["from_status"])
+        pd.testing.assert_frame_equal(self.active_power_profile, active_power_profile)
+
+        table = self.psm.n1_calculations(self.grid_data, self.active_power_profile, self.reactive_power_profile, 17)
+        self.assertTrue(table.empty)
+
+    def test_n1_sweep(self):
+        reported = []
+        table = self.psm.n1_sweep(
+            self.active_power_profile,
+            self.reactive_power_profile,
+            batch_size=2,
+            max_workers=2,
+            progress=lambda finished, total: reported.append((finished, total)),
+        )
+        self.assertListEqual(list(table["Disabled_Line_ID"]), [20, 16, 18, 22, 17, 19, 21, 23])
+        self.assertListEqual(list(table["Alternatives"]), [1, 1, 1, 1, 0, 0, 0, 0])
+        self.assertEqual(reported[-1], (4, 4))
+
+        n1_table = self.psm.n1_calculations(self.grid_data, self.active_power_profile, self.reactive_power_profile, 16)
+        row = table[table["Disabled_Line_ID"] == 16].iloc[0]
+        self.assertEqual(row["Alternative_Line_ID"], n1_table["Alternative_Line_ID"][0])
+        self.assertEqual(row["Max_Loading"], n1_table["Max_Loading"][0])
+        self.assertEqual(row["Max_Loading_Timestamp"], n1_table["Max_Loading_Timestamp"][0])
+
+    def test_n1_sweep_screening(self):
+        table = self.psm.n1_sweep(self.active_power_profile, self.reactive_power_profile)
+        self.assertFalse(table["Screened"].head(4).any())
+        self.assertEqual(table["Screened"].dtype, "boolean")
+
+        # every scenario is within the margin and recalculated with Newton-Raphson
+        full = self.psm.n1_sweep(self.active_power_profile, self.reactive_power_profile, screening_margin=1.0)
+        pd.testing.assert_frame_equal(full, table)
+
+        # no scenario is close to its limit, all keep the linear estimate
+        screened = self.psm.n1_sweep(self.active_power_profile, self.reactive_power_profile, screening_margin=0.2)
+        self.assertTrue(screened["Screened"].head(4).all())
+        self.assertListEqual(sorted(screened["Disabled_Line_ID"]), sorted(table["Disabled_Line_ID"]))
+
+    def test_n1_sweep_interrupted(self):
+        def interrupt(finished, total):
+            raise KeyboardInterrupt
+
+        with self.assertRaises(KeyboardInterrupt) as context:
+            self.psm.n1_sweep(
+                self.active_power_profile, self.reactive_power_profile, batch_size=1, max_workers=1, progress=interrupt
+            )
+        self.assertGreaterEqual(len(context.exception.n1_sweep_results), 1)
+        partial = n1a.n1_contingency_table(context.exception.n1_sweep_results, np.array([16, 18, 20, 22]))
+        self.assertEqual(len(partial), 4)
+        self.assertEqual(partial["Screened"].dtype, "boolean")
+
+    def test_n1_sweep_concurrent(self):
+        expected = self.psm.n1_sweep(self.active_power_profile, self.reactive_power_profile)
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            tables = list(
+                executor.map(
+                    lambda batch_size: self.psm.n1_sweep(
+                        self.active_power_profile, self.reactive_power_profile, batch_size=batch_size
+                    ),
+                    [1, 3],
+                )
+            )
+        for table in tables:
+            pd.testing.assert_frame_equal(table, expected)
+
     def test_EV_penetration(self):
         num_houses = 150
         penetration_level = 20
@@ -167,6 +283,46 @@ class TestPowerSim(unittest.TestCase):
 
         pd.testing.assert_frame_equal(loading_table.head(), expected_load)
 
+    def test_EV_penetration_monte_carlo(self):
+        active_power_profile = self.active_power_profile.copy()
+        psm = pss.PowerSim(
+            grid_data=self.grid_data,
+            active_power_profile=self.active_power_profile,
+            reactive_power_profile=self.reactive_power_profile,
+        )
+        results = psm.ev_penetration_monte_carlo(
+            4, 2, 50, self.ev_active_power_profile, monte_carlo=pss.MonteCarloDraws(6, seed=42, draws_per_batch=4)
+        )
+        pd.testing.assert_frame_equal(self.active_power_profile, active_power_profile)
+        self.assertEqual(results["max_loading"].shape, (6,))
+        self.assertListEqual(list(results["percentiles"].index), [5, 50, 95])
+        self.assertListEqual(list(results["line_percentiles"].index), list(self.grid_data["line"]["id"]))
+
+        # every draw has its own random stream, so chunking does not change the draws
+        unchunked = psm.ev_penetration_monte_carlo(
+            4, 2, 50, self.ev_active_power_profile, monte_carlo=pss.MonteCarloDraws(6, seed=42)
+        )
+        np.testing.assert_array_equal(results["max_loading"], unchunked["max_loading"])
+        np.testing.assert_array_equal(results["min_voltage"], unchunked["min_voltage"])
+
+        # the first draw matches a single time series with its EV assignment
+        load_nodes = self.grid_data["sym_load"]["node"]
+        feeder_loads = pss.ev_feeder_loads(psm.graph, self.grid_data, load_nodes)
+        rng = np.random.default_rng(np.random.SeedSequence(42).spawn(6)[0])
+        loads, ev_profiles = pss.ev_assignment(rng, feeder_loads, 1, self.ev_active_power_profile.shape[1])
+        self.assertEqual(len(loads), 2)
+        active_power_profile.iloc[:, loads] += self.ev_active_power_profile.iloc[:, ev_profiles].to_numpy()
+        tables = psm.power_sim_model.aggregate_tables(active_power_profile, self.reactive_power_profile)
+        self.assertAlmostEqual(results["max_loading"][0], tables["loading_table"]["Max_Loading"].max())
+        self.assertAlmostEqual(results["min_voltage"][0], tables["voltage_table"]["Min_Voltage"].min())
+
+        with self.assertRaises(pss.NotEnoughEVprofilesForHouseAssignment):
+            psm.ev_penetration_monte_carlo(
+                8, 1, 100, self.ev_active_power_profile.iloc[:, :1], monte_carlo=pss.MonteCarloDraws(1)
+            )
+        with self.assertRaises(ValueError):
+            psm.ev_penetration_monte_carlo(4, 2, 50, self.ev_active_power_profile, monte_carlo=pss.MonteCarloDraws(0))
+
     def test_optimal_tap_position_energy_loss(self):
         optimal_tap = self.psm.optimal_tap_position(
             active_power_profile=self.active_power_profile,
@@ -195,6 +351,84 @@ class TestPowerSim(unittest.TestCase):
 
         self.assertEqual(optimal_tap, expected)
 
+    def test_tap_sweep_matches_single_tap_batches(self):
+        sweep = self.psm.power_sim_model.tap_sweep(
+            self.active_power_profile, self.reactive_power_profile, [2, 4], output_component_types=["line"]
+        )
+        self.assertEqual(sweep["line"].shape[:2], (2, len(self.active_power_profile)))
+        for sweep_index, tap_value in enumerate([2, 4]):
+            output_data = self.psm.power_sim_model.batch_powerflow(
+                self.active_power_profile, self.reactive_power_profile, tap_value=tap_value
+            )
+            np.testing.assert_allclose(sweep["line"]["loading"][sweep_index], output_data["line"]["loading"])
+
+    def test_optimal_tap_position_ternary_search(self):
+        for opt_criteria, expected in ((TotalEnergyLoss, 5), (VoltageDeviation, 1)):
+            optimal_tap = self.psm.optimal_tap_position(
+                active_power_profile=self.active_power_profile,
+                reactive_power_profile=self.reactive_power_profile,
+                opt_criteria=opt_criteria,
+                search_strategy=pss.TernarySearch,
+            )
+            self.assertEqual(optimal_tap, expected)
+
+        with self.assertRaises(ValueError):
+            self.psm.optimal_tap_position(search_strategy=None)
+
+        with self.assertRaises(ValueError):
+            self.psm.optimal_tap_position(opt_criteria=None)
+
+    def test_optimal_tap_position_cache(self):
+        cache = pfp.PowerFlowResultCache()
+        psm = pss.PowerSim(grid_data=self.grid_data, lazy=True, cache=cache)
+        self.assertIs(psm.power_sim_model.cache, cache)
+        for _ in range(2):
+            optimal_tap = psm.optimal_tap_position(
+                active_power_profile=self.active_power_profile,
+                reactive_power_profile=self.reactive_power_profile,
+                search_strategy=pss.TernarySearch,
+            )
+            self.assertEqual(optimal_tap, 5)
+        self.assertEqual(cache.stats()["hits"], cache.stats()["misses"])
+
+    def test_ternary_search_evaluations(self):
+        values = np.abs(np.arange(33) - 20.0)
+        evaluated = []
+
+        def evaluate(positions):
+            evaluated.extend(positions)
+            return values[positions]
+
+        self.assertEqual(topt.ternary_search(evaluate, len(values)), 20)
+        self.assertEqual(len(evaluated), len(set(evaluated)))
+        self.assertLess(len(evaluated), 16)
+
+    def test_optimal_tap_schedule(self):
+        schedule = self.psm.optimal_tap_schedule(
+            active_power_profile=self.active_power_profile,
+            reactive_power_profile=self.reactive_power_profile,
+            opt_criteria=VoltageDeviation,
+        )
+        self.assertIsInstance(schedule, pss.TapSchedule)
+        self.assertEqual(schedule.tap_positions.shape, (len(self.active_power_profile),))
+        self.assertTrue(np.all((schedule.tap_positions >= 1) & (schedule.tap_positions <= 5)))
+
+        limited = self.psm.optimal_tap_schedule(
+            active_power_profile=self.active_power_profile,
+            reactive_power_profile=self.reactive_power_profile,
+            opt_criteria=VoltageDeviation,
+            max_tap_changes_per_day=0,
+        )
+        self.assertEqual(limited.tap_changes, 0)
+        self.assertGreaterEqual(limited.criterion.sum(), schedule.criterion.sum())
+
+    def test_limited_change_schedule(self):
+        cost = np.array([[0.0, 5.0], [6.0, 0.0], [0.0, 5.0], [5.0, 0.0]])
+        days = np.array([0, 0, 1, 1])
+        np.testing.assert_array_equal(topt.limited_change_schedule(cost, days, 2), [0, 1, 0, 1])
+        np.testing.assert_array_equal(topt.limited_change_schedule(cost, days, 0), [1, 1, 1, 1])
+        np.testing.assert_array_equal(topt.limited_change_schedule(cost, np.zeros(4), 1), [0, 1, 1, 1])
+
     def test_InvalidLVFeederIDError(self):
 
         # node
@@ -592,6 +826,11 @@ def test_CycleError():
         PowerSim(grid_data=input_data, lv_feeders=lv_feeders)
     assert str(excinfo.value) == "Cycle found"
 
+    # a lazy PowerSim raises on first use of the graph
+    psm = PowerSim(grid_data=input_data, lv_feeders=lv_feeders, lazy=True)
+    with pytest.raises(GraphCycleError):
+        psm.network_plotter()
+
 
 def test_GraphNotFullyConnectedError():
 